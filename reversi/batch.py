@@ -0,0 +1,329 @@
+"""
+Batched Reversi engine on NumPy arrays.
+
+ReversiBatch plays many games of the same kind in lockstep. The boards
+are stored as one (games x side x side) array, and legal moves, flips
+and finished games are computed for the whole batch at once with
+shifted boolean arrays. Each game follows exactly the same rules as
+Reversi, so it reaches the same positions and outcome for the same
+moves.
+
+iter_positions loads a dataset of positions into a single game, one
+position after another, checking the whole dataset at once.
+
+Requires NumPy.
+"""
+from typing import Iterator, List, Tuple
+
+import numpy as np
+
+from reversi import BoardGridType, ReversiBase
+
+
+direction_list = [
+    (0, 1), #right
+    (1, 1), #right-down
+    (1, 0), #down
+    (1, -1), #left-down
+    (0, -1), #left
+    (-1, -1), #left-up
+    (-1, 0), #up
+    (-1, 1) #right-up
+]
+
+
+def shift(squares: np.ndarray, d_row: int, d_col: int) -> np.ndarray:
+    """
+    Moves every square of a batch of boolean boards one step in a
+    direction, dropping the squares that fall off the board
+
+    Inputs:
+        squares (array): boolean array of shape (games, side, side)
+        d_row (int): row step (-1, 0 or 1)
+        d_col (int): column step (-1, 0 or 1)
+
+    Returns:
+        The shifted array
+    """
+    side = squares.shape[1]
+    shifted = np.zeros_like(squares)
+    shifted[:, max(d_row, 0):side + min(d_row, 0),
+            max(d_col, 0):side + min(d_col, 0)] = \
+        squares[:, max(-d_row, 0):side + min(-d_row, 0),
+                max(-d_col, 0):side + min(-d_col, 0)]
+    return shifted
+
+
+def iter_positions(game: ReversiBase, turns: np.ndarray,
+                   boards: np.ndarray) -> Iterator[ReversiBase]:
+    """
+    Loads the positions of a dataset into a game one after another.
+    The whole dataset is checked at once, and each position is then
+    loaded with ReversiBase.load_bytes without checking it again.
+
+    Inputs:
+        game (ReversiBase): game to load the positions into; it is
+            yielded once for each position, so it must be copied to be
+            kept
+        turns (array): player to move in each position
+        boards (array): integer array of shape (positions, side, side)
+            with the owner of each square (0 for an empty square)
+
+    Returns:
+        An iterator that yields the game in each position
+
+    Raises:
+        ValueError: If the dataset does not match the game, or holds
+        values that are not players
+    """
+    boards = np.asarray(boards)
+    turns = np.asarray(turns)
+    side = game.size
+    if boards.ndim != 3 or boards.shape[1:] != (side, side):
+        raise ValueError("the dataset is inconsistent with the size of the"
+                         " board")
+    if turns.shape != boards.shape[:1]:
+        raise ValueError("the dataset needs one turn for each position")
+    if len(boards) == 0:
+        return
+    if boards.min() < 0 or boards.max() > game.num_players or \
+            turns.min() < 1 or turns.max() > game.num_players:
+        raise ValueError("the dataset is inconsistent with the number of"
+                         " players")
+    data = boards.astype(np.uint8).tobytes()
+    squares = side * side
+    for index, turn in enumerate(turns.tolist()):
+        game.load_bytes(turn, data[index * squares:(index + 1) * squares],
+                        validate=False)
+        yield game
+
+
+class ReversiBatch:
+    """
+    Class to represent a batch of Reversi games played in lockstep.
+
+    Attributes:
+        boards (array): int8 array of shape (games, side, side), with
+            the player number on each square or 0 if it is empty
+        turns (array): int8 array with the player to move in each game
+            (meaningless in finished games)
+        done (array): boolean array, True for finished games
+        legal (array): boolean array of shape (games, side, side) with
+            the legal moves of the player to move in each game
+    """
+    boards: np.ndarray
+    turns: np.ndarray
+    done: np.ndarray
+    legal: np.ndarray
+
+    def __init__(self, num_games: int, side: int, players: int,
+                 othello: bool):
+        """
+        Constructor
+
+        Args:
+            num_games: Number of games in the batch
+            side: Number of squares on each side of the board
+            players: Number of players
+            othello: Whether to initialize the boards with an Othello
+            configuration.
+
+        Raises:
+            ValueError: If the parity of side and players is incorrect
+        """
+        if side % 2 != players % 2:
+            raise ValueError("The parity of the board does not match the"
+                             " number of players")
+        if side <= 3:
+            raise ValueError("The board must be of size 4x4 or above")
+        self._side = side
+        self._players = players
+        self._othello = othello
+
+        low = int(side / 2 - players / 2)
+        high = int(side / 2 + players / 2)
+        self._center = np.zeros((side, side), dtype=bool)
+        self._center[low:high, low:high] = True
+
+        self.boards = np.zeros((num_games, side, side), dtype=np.int8)
+        if othello:
+            smaller_side = side // 2 - 1
+            larger_side = side // 2
+            self.boards[:, larger_side, smaller_side] = 1
+            self.boards[:, smaller_side, larger_side] = 1
+            self.boards[:, larger_side, larger_side] = 2
+            self.boards[:, smaller_side, smaller_side] = 2
+        self.turns = np.ones(num_games, dtype=np.int8)
+        self.done = np.zeros(num_games, dtype=bool)
+        self.legal = np.zeros((num_games, side, side), dtype=bool)
+        self._update_status(np.ones(num_games, dtype=bool))
+
+    @property
+    def size(self) -> int:
+        """
+        Returns the size of the boards (the number of squares per side)
+        """
+        return self._side
+
+    @property
+    def num_players(self) -> int:
+        """
+        Returns the number of players
+        """
+        return self._players
+
+    def __len__(self) -> int:
+        """
+        Returns the number of games in the batch
+        """
+        return len(self.boards)
+
+    def legal_moves_for(self, games: np.ndarray,
+                        players: np.ndarray) -> np.ndarray:
+        """
+        Computes legal moves for a subset of the games.
+
+        Args:
+            games: Indices of the games
+            players: Player to compute the moves of, for each game
+
+        Returns: Boolean array of shape (len(games), side, side)
+        """
+        boards = self.boards[games]
+        own = boards == players[:, None, None]
+        empty = boards == 0
+        enemy = ~(own | empty)
+        moves = np.zeros_like(own)
+        for d_row, d_col in direction_list:
+            frontier = shift(own, d_row, d_col) & enemy
+            while frontier.any():
+                frontier = shift(frontier, d_row, d_col)
+                moves |= frontier & empty
+                frontier &= enemy
+
+        if not self._othello:
+            setup = (np.count_nonzero(boards, axis=(1, 2))
+                     < self._players ** 2)
+            moves[setup] = self._center & empty[setup]
+        return moves
+
+    def _update_status(self, games: np.ndarray) -> None:
+        """
+        For each selected game, moves the turn to the first player,
+        starting with the current one, that can make a move, and
+        records whether the game is over
+
+        Args:
+            games: Boolean array selecting the games to update
+        """
+        pending = np.flatnonzero(games & ~self.done)
+        turns = self.turns[pending]
+        for _ in range(self._players):
+            if len(pending) == 0:
+                break
+            moves = self.legal_moves_for(pending, turns)
+            found = moves.any(axis=(1, 2))
+            self.turns[pending[found]] = turns[found]
+            self.legal[pending[found]] = moves[found]
+            pending = pending[~found]
+            turns = turns[~found] % self._players + 1
+        self.done[pending] = True
+        self.legal[pending] = False
+
+    def apply_moves(self, squares: np.ndarray) -> None:
+        """
+        Places a piece for the player to move in every unfinished game,
+        flips the pieces it eats, and advances the turns.
+
+        Args:
+            squares: Integer array with the square (row * side + col)
+            to play in each game. Entries for finished games are
+            ignored. The squares are assumed to be legal moves.
+
+        Returns: None
+        """
+        active = np.flatnonzero(~self.done)
+        if len(active) == 0:
+            return
+        side = self._side
+        rows, cols = np.divmod(np.asarray(squares)[active], side)
+        players = self.turns[active]
+        boards = self.boards[active]
+
+        index = np.arange(len(active))
+        boards[index, rows, cols] = players
+        # walk the ray in each direction from every placed piece at
+        # once, measuring the run of enemy pieces and whether it ends
+        # on one of the player's pieces
+        for d_row, d_col in direction_list:
+            length = np.zeros(len(active), dtype=np.intp)
+            flanked = np.zeros(len(active), dtype=bool)
+            running = np.ones(len(active), dtype=bool)
+            for step in range(1, side):
+                ray_rows = rows + step * d_row
+                ray_cols = cols + step * d_col
+                running &= ((ray_rows >= 0) & (ray_rows < side) &
+                            (ray_cols >= 0) & (ray_cols < side))
+                if not running.any():
+                    break
+                values = np.zeros(len(active), dtype=np.int8)
+                values[running] = boards[index[running], ray_rows[running],
+                                         ray_cols[running]]
+                flanked |= running & (values == players) & (length > 0)
+                running &= (values != 0) & (values != players)
+                length += running
+            for step in range(1, side):
+                eaten = flanked & (length >= step)
+                if not eaten.any():
+                    break
+                boards[index[eaten], rows[eaten] + step * d_row,
+                       cols[eaten] + step * d_col] = players[eaten]
+
+        self.boards[active] = boards
+        self.turns[active] = players % self._players + 1
+        moved = np.zeros(len(self.boards), dtype=bool)
+        moved[active] = True
+        self._update_status(moved)
+
+    def piece_counts(self) -> np.ndarray:
+        """
+        Returns an integer array of shape (games, players) with how
+        many pieces each player has in each game
+        """
+        players = np.arange(1, self._players + 1, dtype=np.int8)
+        return (self.boards[:, :, :, None] == players).sum(axis=(1, 2))
+
+    def winners(self) -> np.ndarray:
+        """
+        Returns a boolean array of shape (games, players), True for
+        the players who won (or tied for the win) each finished game.
+        Rows for unfinished games are all False.
+        """
+        counts = self.piece_counts()
+        winners = counts == counts.max(axis=1, keepdims=True)
+        winners[~self.done] = False
+        return winners
+
+    def outcome(self, game: int) -> List[int]:
+        """
+        Returns the list of winners for one game, like
+        Reversi.outcome (empty if the game is not yet done)
+        """
+        return [int(player) + 1
+                for player in np.flatnonzero(self.winners()[game])]
+
+    def grid(self, game: int) -> BoardGridType:
+        """
+        Returns the board of one game as a list of lists, like
+        Reversi.grid
+        """
+        return [[int(value) if value else None for value in row]
+                for row in self.boards[game]]
+
+    def available_moves(self, game: int) -> List[Tuple[int, int]]:
+        """
+        Returns the sorted list of legal moves in one game, like
+        Reversi.available_moves
+        """
+        rows, cols = np.nonzero(self.legal[game])
+        return list(zip(rows.tolist(), cols.tolist()))
@@ -0,0 +1,152 @@
+"""
+Benchmarks for the Reversi engines.
+
+Plays the same seeded random games with each engine and reports
+games per second, time per move and memory per game object, checking
+that every engine reaches the same outcome. Also times generating
+the legal moves of positions from those games from scratch.
+
+Usage:
+    python benchmark.py [-n num_games] [-s side] [-p players] [--non-othello]
+"""
+import random
+import sys
+import time
+import tracemalloc
+from typing import List, Tuple, Type
+
+from reversi import BoardGridType, Reversi, ReversiBase
+from bitboard import BitboardReversi
+
+
+def play_random_game(engine: Type[ReversiBase], side: int, players: int,
+                     othello: bool, seed: int,
+                     max_moves: int = -1) -> Tuple[ReversiBase, int]:
+    """
+    Plays a game where every player picks a random move, until it is
+    over or max_moves moves have been made (if max_moves is not
+    negative), and returns the game and the number of moves made.
+    Moves are sorted before choosing so that engines given the same
+    seed play the same game.
+    """
+    rng = random.Random(seed)
+    game = engine(side, players, othello)
+    num_moves = 0
+    while not game.done and num_moves != max_moves:
+        game.apply_move(rng.choice(sorted(game.available_moves)))
+        num_moves += 1
+    return game, num_moves
+
+
+def bench_games(engine: Type[ReversiBase], num_games: int, side: int,
+                players: int, othello: bool
+                ) -> Tuple[float, float, List[List[int]]]:
+    """
+    Times num_games random games, returning the games per second,
+    the microseconds per move and the list of outcomes
+    """
+    outcomes = []
+    total_moves = 0
+    start = time.perf_counter()
+    for seed in range(num_games):
+        game, num_moves = play_random_game(engine, side, players, othello,
+                                           seed)
+        outcomes.append(sorted(game.outcome))
+        total_moves += num_moves
+    elapsed = time.perf_counter() - start
+    return num_games / elapsed, elapsed * 1e6 / total_moves, outcomes
+
+
+def random_positions(num_games: int, side: int, players: int,
+                     othello: bool) -> List[Tuple[int, BoardGridType]]:
+    """
+    Returns the (turn, grid) of every position reached in num_games
+    seeded random games
+    """
+    positions = []
+    for seed in range(num_games):
+        rng = random.Random(seed)
+        game = Reversi(side, players, othello)
+        while not game.done:
+            positions.append((game.turn, game.grid))
+            game.apply_move(rng.choice(sorted(game.available_moves)))
+    return positions
+
+
+def bench_move_generation(engine: Type[ReversiBase],
+                          positions: List[Tuple[int, BoardGridType]],
+                          side: int, players: int, othello: bool) -> float:
+    """
+    Times loading each position into a new game and listing its legal
+    moves, which makes the engine generate them from scratch, and
+    returns the microseconds per position
+    """
+    elapsed = 0.0
+    for turn, grid in positions:
+        game = engine(side, players, othello)
+        start = time.perf_counter()
+        game.load_game(turn, grid)
+        game.available_moves
+        elapsed += time.perf_counter() - start
+    return elapsed * 1e6 / len(positions)
+
+
+def bench_memory(engine: Type[ReversiBase], num_games: int, side: int,
+                 players: int, othello: bool) -> float:
+    """
+    Measures the memory held by game objects halfway through random
+    games, returning the bytes per game. Tables that are shared by
+    every game of the same size are built before measuring, so they
+    are not counted.
+    """
+    half = side * side // 2
+    play_random_game(engine, side, players, othello, 0, half)
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        games = [play_random_game(engine, side, players, othello, seed,
+                                  half)[0]
+                 for seed in range(num_games)]
+        used = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    return used / len(games)
+
+
+if __name__ == "__main__":
+    num_games = 20
+    side = 8
+    players = 2
+    othello = True
+
+    for i, item in enumerate(sys.argv):
+        if item == "-n":
+            num_games = int(sys.argv[i + 1])
+        if item == "-s":
+            side = int(sys.argv[i + 1])
+        if item == "-p":
+            players = int(sys.argv[i + 1])
+        if item == "--non-othello":
+            othello = False
+
+    engines = [Reversi, BitboardReversi]
+
+    positions = random_positions(num_games, side, players, othello)
+    baseline = None
+    baseline_outcomes = None
+    for engine in engines:
+        rate, move_time, outcomes = bench_games(engine, num_games, side,
+                                                players, othello)
+        memory = bench_memory(engine, num_games, side, players, othello)
+        generation_time = bench_move_generation(engine, positions, side,
+                                                players, othello)
+        if baseline is None:
+            baseline = rate
+            baseline_outcomes = outcomes
+        elif outcomes != baseline_outcomes:
+            print(f"{engine.__name__}: outcomes differ from "
+                  f"{engines[0].__name__}")
+        print(f"{engine.__name__:>16}: {rate:10.1f} games/s "
+              f"({rate / baseline:.1f}x) {move_time:8.1f} us/move "
+              f"{memory / 1024:8.1f} KB/game "
+              f"{generation_time:8.1f} us/movegen")
@@ -0,0 +1,701 @@
+"""
+Bitboard implementation of Reversi.
+
+Each player's pieces are stored as a single arbitrary-width integer
+mask, with bit (row * side + col) set when that player has a piece on
+(row, col). This works for any board side and number of players.
+Move generation and flipping are done with whole-board shift-and-mask
+operations instead of walking each piece along each direction, using
+border masks that are computed once per board side.
+"""
+from copy import copy
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from reversi import (BoardGridType, ListMovesType, ReversiBase,
+                     bytes_to_masks, canonical_masks, masks_hash,
+                     symmetry_tables, zobrist_keys)
+
+
+direction_list = [
+    (0, 1), #right
+    (1, 1), #right-down
+    (1, 0), #down
+    (1, -1), #left-down
+    (0, -1), #left
+    (-1, -1), #left-up
+    (-1, 0), #up
+    (-1, 1) #right-up
+]
+
+
+@lru_cache(maxsize=None)
+def board_masks(side: int) -> Tuple[int, List[Tuple[int, int]]]:
+    """
+    Computes the masks used to shift a board of a given side
+
+    Inputs:
+        side (int): number of squares on each side of the board
+
+    Returns:
+        The mask of all squares on the board, and for each direction
+        the amount to shift by (positive is a left shift) paired with
+        the mask that removes bits that wrapped around an edge
+    """
+    full = (1 << (side * side)) - 1
+    left_col = 0
+    right_col = 0
+    for row in range(side):
+        left_col |= 1 << (row * side)
+        right_col |= 1 << (row * side + side - 1)
+    shifts = []
+    for d_row, d_col in direction_list:
+        mask = full
+        if d_col == 1:
+            mask &= ~left_col
+        elif d_col == -1:
+            mask &= ~right_col
+        shifts.append((d_row * side + d_col, mask))
+    return full, shifts
+
+
+@lru_cache(maxsize=None)
+def center_mask(side: int, players: int) -> int:
+    """
+    Computes the mask of the central squares that must be filled
+    before a non-Othello game continues with regular moves
+
+    Inputs:
+        side (int): number of squares on each side of the board
+        players (int): number of players
+
+    Returns:
+        The mask of the central players x players squares
+    """
+    low = int(side / 2 - players / 2)
+    high = int(side / 2 + players / 2)
+    mask = 0
+    for row in range(low, high):
+        for col in range(low, high):
+            mask |= 1 << (row * side + col)
+    return mask
+
+
+def flip_vertical(mask: int) -> int:
+    """
+    Mirrors an 8x8 mask top to bottom, by reversing the order of
+    its bytes (the rows)
+    """
+    return int.from_bytes(mask.to_bytes(8, "little"), "big")
+
+
+def mirror_horizontal(mask: int) -> int:
+    """
+    Mirrors an 8x8 mask left to right, by reversing the bits of each
+    byte with three rounds of swaps
+    """
+    mask = ((mask >> 1) & 0x5555555555555555) | \
+        ((mask & 0x5555555555555555) << 1)
+    mask = ((mask >> 2) & 0x3333333333333333) | \
+        ((mask & 0x3333333333333333) << 2)
+    return ((mask >> 4) & 0x0F0F0F0F0F0F0F0F) | \
+        ((mask & 0x0F0F0F0F0F0F0F0F) << 4)
+
+
+def transpose(mask: int) -> int:
+    """
+    Mirrors an 8x8 mask along its main diagonal (square (row, col)
+    goes to (col, row)), by swapping bits 7, 14 and 28 squares apart
+    """
+    swap = 0x0F0F0F0F00000000 & (mask ^ (mask << 28))
+    mask ^= swap ^ (swap >> 28)
+    swap = 0x3333000033330000 & (mask ^ (mask << 14))
+    mask ^= swap ^ (swap >> 14)
+    swap = 0x5500550055005500 & (mask ^ (mask << 7))
+    return mask ^ swap ^ (swap >> 7)
+
+
+def symmetric_masks(mask: int) -> List[int]:
+    """
+    Returns the images of an 8x8 mask under every symmetry, in the
+    order of reversi.transform_position
+    """
+    transposed = transpose(mask)
+    mirrored = mirror_horizontal(mask)
+    rotated = mirror_horizontal(transposed)
+    return [mask, rotated, flip_vertical(mirrored),
+            flip_vertical(transposed), mirrored, flip_vertical(mask),
+            transposed, flip_vertical(rotated)]
+
+
+class BitboardReversi(ReversiBase):
+    """
+    Reversi game backed by one integer mask per player
+    """
+
+    _masks: List[int]
+    _occupied: int
+    _full: int
+    _shifts: List[Tuple[int, int]]
+    _center: int
+    _turn: int
+    _moves: int
+    _done: bool
+    _outcome: List[int]
+    _hash: int
+    _square_keys: List[List[int]]
+    _turn_keys: List[int]
+    _undo_stack: List[Tuple[int, List[Tuple[int, int]], int, int, bool,
+                            int]]
+
+    def __init__(self, side: int, players: int, othello: bool):
+        """
+        Constructor
+
+        Args:
+            side: Number of squares on each side of the board
+            players: Number of players
+            othello: Whether to initialize the board with an Othello
+            configuration.
+
+        Raises:
+            ValueError: If the parity of side and players is incorrect
+        """
+        super().__init__(side, players, othello)
+        if side % 2 != players % 2:
+            raise ValueError("The parity of the board does not match the"
+                             " number of players")
+        if side <= 3:
+            raise ValueError("The board must be of size 4x4 or above")
+        self._full, self._shifts = board_masks(side)
+        self._center = center_mask(side, players)
+        self._square_keys, self._turn_keys = zobrist_keys(side)
+
+        self._masks = [0] * (players + 1)
+        if othello:
+            smaller_side = side // 2 - 1
+            larger_side = side // 2
+            self._masks[1] = (1 << (larger_side * side + smaller_side) |
+                              1 << (smaller_side * side + larger_side))
+            self._masks[2] = (1 << (larger_side * side + larger_side) |
+                              1 << (smaller_side * side + smaller_side))
+        self._occupied = self._masks[1] | self._masks[2]
+        self._hash = self._compute_hash()
+
+        self._turn = 1
+        self._undo_stack = []
+        self._update_status()
+
+    #
+    # PROPERTIES
+    #
+
+    @property
+    def grid(self) -> BoardGridType:
+        """
+        Returns the state of the game board as a list of lists.
+        Each entry can either be an integer (meaning there is a
+        piece at that location for that player) or None,
+        meaning there is no piece in that location. Players are
+        numbered from 1.
+        """
+        side = self._side
+        grid: BoardGridType = [[None] * side for _ in range(side)]
+        for player in range(1, self._players + 1):
+            mask = self._masks[player]
+            while mask:
+                low = mask & -mask
+                row, col = divmod(low.bit_length() - 1, side)
+                grid[row][col] = player
+                mask ^= low
+        return grid
+
+    @property
+    def turn(self) -> int:
+        """
+        Returns the player number for the player who must make
+        the next move (i.e., "whose turn is it?")  Players are
+        numbered from 1.
+
+        If the game is over, this property will not return
+        any meaningful value.
+        """
+        return self._turn
+
+    @property
+    def available_moves(self) -> ListMovesType:
+        """
+        Returns the list of positions where the current player
+        (as returned by the turn method) could place a piece.
+
+        If the game is over, this property will not return
+        any meaningful value.
+        """
+        return self._positions(self._moves)
+
+    @property
+    def done(self) -> bool:
+        """
+        Returns True if the game is over, False otherwise.
+        """
+        return self._done
+
+    @property
+    def outcome(self) -> List[int]:
+        """
+        Returns the list of winners for the game. If the game
+        is not yet done, will return an empty list.
+        If the game is done, will return a list of player numbers
+        (players are numbered from 1). If there is a single winner,
+        the list will contain a single integer. If there is a tie,
+        the list will contain more than one integer (representing
+        the players who tied)
+        """
+        return list(self._outcome)
+
+    @property
+    def position_hash(self) -> int:
+        """
+        Returns a 64-bit Zobrist hash of the position, covering the
+        pieces on the board and whose turn it is. Equal positions
+        hash the same as with the list-based Reversi engine.
+        """
+        return self._hash ^ self._turn_keys[self._turn]
+
+    def canonical_key(self) -> Tuple[int, int]:
+        """
+        Returns a hash of the position that is the same for all its
+        rotations and reflections, and the symmetry that maps the
+        position to its canonical form (see ReversiBase.canonical_key).
+        On 8x8 boards the masks are transformed with whole-board bit
+        swaps; other sides move each piece through a table.
+        """
+        side = self._side
+        masks = self._masks[1:]
+        if side == 8:
+            images = list(zip(*map(symmetric_masks, masks)))
+        else:
+            tables = symmetry_tables(side)
+            images = []
+            for table in tables:
+                image = []
+                for mask in masks:
+                    moved = 0
+                    while mask:
+                        low = mask & -mask
+                        moved |= 1 << table[low.bit_length() - 1]
+                        mask ^= low
+                    image.append(moved)
+                images.append(tuple(image))
+        return canonical_masks(images, self._turn, side)
+
+    #
+    # METHODS
+    #
+
+    def _bit(self, pos: Tuple[int, int]) -> int:
+        """
+        Returns the single-bit mask for a position, checking bounds
+        """
+        row, col = pos
+        if row > self._side - 1 or col > self._side - 1 or row < 0 or col < 0:
+            raise ValueError("Position is outside of the board")
+        return 1 << (row * self._side + col)
+
+    def _compute_hash(self) -> int:
+        """
+        Computes the Zobrist hash of the pieces on the board
+        """
+        value = 0
+        for player in range(1, self._players + 1):
+            mask = self._masks[player]
+            while mask:
+                low = mask & -mask
+                value ^= self._square_keys[low.bit_length() - 1][player]
+                mask ^= low
+        return value
+
+    def _flip_hash(self, player: int, bit: int, owners: List[Tuple[int, int]]
+                   ) -> None:
+        """
+        Updates the hash for player placing a piece on bit and taking
+        over the pieces in owners, a list of (previous owner, mask)
+        """
+        keys = self._square_keys
+        value = self._hash ^ keys[bit.bit_length() - 1][player]
+        for other, eaten in owners:
+            while eaten:
+                low = eaten & -eaten
+                square_keys = keys[low.bit_length() - 1]
+                value ^= square_keys[other] ^ square_keys[player]
+                eaten ^= low
+        self._hash = value
+
+    def _moves_for(self, player: int) -> int:
+        """
+        Returns the mask of squares where player could place a piece
+        """
+        occupied = self._occupied
+        empty = self._full & ~occupied
+        if not self._othello and occupied.bit_count() < self._players ** 2:
+            return self._center & empty
+
+        own = self._masks[player]
+        enemy = occupied & ~own
+        moves = 0
+        for amount, mask in self._shifts:
+            enemy_m = enemy & mask
+            empty_m = empty & mask
+            if amount > 0:
+                frontier = (own << amount) & enemy_m
+                while frontier:
+                    frontier <<= amount
+                    moves |= frontier & empty_m
+                    frontier &= enemy_m
+            else:
+                amount = -amount
+                frontier = (own >> amount) & enemy_m
+                while frontier:
+                    frontier >>= amount
+                    moves |= frontier & empty_m
+                    frontier &= enemy_m
+        return moves
+
+    def _flips_for(self, player: int, bit: int) -> int:
+        """
+        Returns the mask of pieces flipped when player places
+        a piece on the square given by bit
+        """
+        own = self._masks[player]
+        enemy = self._occupied & ~own
+        flips = 0
+        for amount, mask in self._shifts:
+            enemy_m = enemy & mask
+            own_m = own & mask
+            run = 0
+            if amount > 0:
+                curr = (bit << amount) & enemy_m
+                while curr:
+                    run |= curr
+                    curr <<= amount
+                    if curr & own_m:
+                        flips |= run
+                        break
+                    curr &= enemy_m
+            else:
+                amount = -amount
+                curr = (bit >> amount) & enemy_m
+                while curr:
+                    run |= curr
+                    curr >>= amount
+                    if curr & own_m:
+                        flips |= run
+                        break
+                    curr &= enemy_m
+        return flips
+
+    def _update_status(self) -> None:
+        """
+        Moves the turn to the first player, starting with the current
+        one, that can make a move, and records whether the game is
+        over (and if so, who won)
+        """
+        for i in range(self._players):
+            player = (self._turn - 1 + i) % self._players + 1
+            moves = self._moves_for(player)
+            if moves:
+                self._turn = player
+                self._moves = moves
+                self._done = False
+                self._outcome = []
+                return
+        counts = [self._masks[player].bit_count()
+                  for player in range(1, self._players + 1)]
+        best = max(counts)
+        self._moves = 0
+        self._done = True
+        self._outcome = [player for player, count in enumerate(counts, 1)
+                         if count == best]
+
+    def piece_at(self, pos: Tuple[int, int]) -> Optional[int]:
+        """
+        Returns the piece at a given location
+
+        Args:
+            pos: Position on the board
+
+        Raises:
+            ValueError: If the specified position is outside
+            the bounds of the board.
+
+        Returns: If there is a piece at the specified location,
+        return the number of the player (players are numbered
+        from 1). Otherwise, return None.
+        """
+        bit = self._bit(pos)
+        for player in range(1, self._players + 1):
+            if self._masks[player] & bit:
+                return player
+        return None
+
+    def legal_move(self, pos: Tuple[int, int]) -> bool:
+        """
+        Checks if a move is legal.
+
+        Args:
+            pos: Position on the board
+
+        Raises:
+            ValueError: If the specified position is outside
+            the bounds of the board.
+
+        Returns: If the current player (as returned by the turn
+        method) could place a piece in the specified position,
+        return True. Otherwise, return False.
+        """
+        return bool(self._moves & self._bit(pos))
+
+    def _positions(self, mask: int) -> ListMovesType:
+        """
+        Returns the positions of the bits set in a mask, in order
+        """
+        side = self._side
+        positions = []
+        while mask:
+            low = mask & -mask
+            positions.append(divmod(low.bit_length() - 1, side))
+            mask ^= low
+        return positions
+
+    def flips_for_move(self, pos: Tuple[int, int]) -> ListMovesType:
+        """
+        Returns the pieces that would be flipped if the current
+        player (as returned by the turn method) placed a piece
+        in the specified position, without altering the game.
+
+        Args:
+            pos: Position on the board
+
+        Raises:
+            ValueError: If the specified position is outside
+            the bounds of the board.
+
+        Returns: The list of positions of the flipped pieces
+        """
+        return self._positions(self._flips_for(self._turn, self._bit(pos)))
+
+    def moves_with_flips(self) -> Dict[Tuple[int, int], ListMovesType]:
+        """
+        Returns every move available to the current player (in
+        the same order as available_moves), each with the list of
+        pieces it would flip, without altering the game.
+        """
+        side = self._side
+        player = self._turn
+        result = {}
+        mask = self._moves
+        while mask:
+            low = mask & -mask
+            move = divmod(low.bit_length() - 1, side)
+            result[move] = self._positions(self._flips_for(player, low))
+            mask ^= low
+        return result
+
+    def apply_move(self, pos: Tuple[int, int]) -> None:
+        """
+        Place a piece of the current player (as returned
+        by the turn method) on the board.
+
+        The provided position is assumed to be a legal
+        move (as returned by available_moves, or checked
+        by legal_move). The behaviour of this method
+        when the position is on the board, but is not
+        a legal move, is undefined.
+
+        After applying the move, the turn is updated to the
+        next player who can make a move. For example, in a 4
+        player game, suppose it is player 1's turn, they
+        apply a move, and players 2 and 3 have no possible
+        moves, but player 4 does. After player 1's move,
+        the turn would be set to 4 (not to 2).
+
+        If, after applying the move, none of the players
+        can make a move, the game is over, and the value
+        of the turn becomes moot. It cannot be assumed to
+        take any meaningful value.
+
+        Args:
+            pos: Position on the board
+
+        Raises:
+            ValueError: If the specified position is outside
+            the bounds of the board.
+
+        Returns: None
+        """
+        bit = self._bit(pos)
+        if self._done:
+            return
+        self._place(self._turn, bit)
+        self._turn = self._turn % self._players + 1
+        self._update_status()
+
+    def _place(self, player: int, bit: int) -> List[Tuple[int, int]]:
+        """
+        Places a piece for player on the square given by bit and
+        flips the pieces it eats, without advancing the turn
+
+        Returns: The flipped pieces as a list of (previous owner, mask)
+        """
+        flips = self._flips_for(player, bit)
+        owners = []
+        if flips:
+            for other in range(1, self._players + 1):
+                eaten = self._masks[other] & flips
+                if eaten:
+                    owners.append((other, eaten))
+                    self._masks[other] ^= eaten
+        self._masks[player] |= bit | flips
+        self._occupied |= bit
+        self._flip_hash(player, bit, owners)
+        return owners
+
+    def push_move(self, pos: Tuple[int, int]) -> None:
+        """
+        Applies a move like apply_move, recording what it changed
+        so that it can be undone with pop_move.
+
+        Args:
+            pos: Position on the board
+
+        Raises:
+            ValueError: If the specified position is outside
+            the bounds of the board.
+
+        Returns: None
+        """
+        bit = self._bit(pos)
+        player = self._turn
+        if self._done:
+            self._undo_stack.append((0, [], player, self._moves, True,
+                                     self._hash))
+            return
+        moves = self._moves
+        value = self._hash
+        owners = self._place(player, bit)
+        self._undo_stack.append((bit, owners, player, moves, False, value))
+        self._turn = player % self._players + 1
+        self._update_status()
+
+    def pop_move(self) -> None:
+        """
+        Undoes the last move applied with push_move, restoring
+        the state of the game from before that move.
+
+        Raises:
+            IndexError: If there is no move to undo
+
+        Returns: None
+        """
+        bit, owners, player, moves, done, value = self._undo_stack.pop()
+        if bit:
+            self._masks[player] &= ~bit
+            self._occupied &= ~bit
+            for other, eaten in owners:
+                self._masks[player] &= ~eaten
+                self._masks[other] |= eaten
+        self._hash = value
+        self._turn = player
+        self._moves = moves
+        self._done = done
+        if not done:
+            self._outcome = []
+
+    def load_game(self, turn: int, grid: BoardGridType) -> None:
+        """
+        Loads the state of a game, replacing the current
+        state of the game.
+
+        Args:
+            turn: The player number of the player that
+            would make the next move ("whose turn is it?")
+            Players are numbered from 1.
+            grid: The state of the board as a list of lists
+            (same as returned by the grid property)
+
+        Raises:
+             ValueError:
+             - If the value of turn is inconsistent
+               with the _players attribute.
+             - If the size of the grid is inconsistent
+               with the _side attribute.
+             - If any value in the grid is inconsistent
+               with the _players attribute.
+
+        Returns: None
+        """
+        self._check_turn(turn)
+        self.load_bytes(turn, self._grid_bytes(grid), validate=False)
+
+    def load_bytes(self, turn: int, data: bytes,
+                   validate: bool = True) -> None:
+        """
+        Loads the state of a game from one byte per square (see
+        ReversiBase.load_bytes)
+        """
+        self._check_turn(turn)
+        if validate:
+            self._check_bytes(data)
+        self.load_masks(turn, bytes_to_masks(data, self._players),
+                        validate=False)
+
+    def load_masks(self, turn: int, masks: Sequence[int],
+                   validate: bool = True) -> None:
+        """
+        Loads the state of a game from one bit mask per player (see
+        ReversiBase.load_masks), which is this engine's own form
+        """
+        self._check_turn(turn)
+        if validate:
+            self._check_masks(masks)
+        self._masks = [0, *masks]
+        occupied = 0
+        for mask in masks:
+            occupied |= mask
+        self._occupied = occupied
+        self._hash = masks_hash(masks, self._side)
+        self._undo_stack = []
+        self._turn = turn
+        self._update_status()
+
+    def simulate_moves(self,
+                       moves: ListMovesType
+                       ) -> "BitboardReversi":
+        """
+        Simulates the effect of making a sequence of moves,
+        **without** altering the state of the game (instead,
+        returns a new object with the result of applying
+        the provided moves).
+
+        The provided positions are assumed to be legal
+        moves. The behaviour of this method when a
+        position is on the board, but is not a legal
+        move, is undefined.
+
+        Args:
+            moves: List of positions, representing moves.
+
+        Raises:
+            ValueError: If any of the specified positions
+            is outside the bounds of the board.
+
+        Returns: An object of the same type as the object
+        the method was called on, reflecting the state
+        of the game after applying the provided moves.
+        """
+        new_game = copy(self)
+        new_game._masks = list(self._masks)
+        new_game._undo_stack = []
+        for move in moves:
+            new_game.apply_move(move)
+        return new_game
@@ -0,0 +1,268 @@
+"""
+Opening book for Reversi.
+
+The book maps positions from the first moves of a game to the move a
+deep search found for them. It is built by playing self-play games on
+a pool of worker processes, searching every position of the opening
+with alpha-beta, and is saved as a file of fixed-size records sorted
+by position hash. Bots open it with mmap and find positions by binary
+search, so opening a book reads nothing up front, and every process
+using the same book shares the one copy in the page cache.
+
+Positions are stored in their canonical form (see
+ReversiBase.canonical_key), so a rotated or mirrored opening finds the
+same record, and the move stored is mapped back onto the board.
+
+Usage:
+    python book.py [-o book_file] [-g num_games] [-d plies]
+                   [--nodes nodes] [-w workers] [-s seed]
+"""
+from concurrent.futures import ProcessPoolExecutor
+import mmap
+import os
+import random
+import struct
+import sys
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from reversi import (Reversi, ReversiBase, inverse_transform,
+                     transform_position)
+from search import AlphaBetaSearch
+
+
+BOOK_MAGIC = b"RVB2"
+"""
+First bytes of every book file. Books keyed by the plain position hash,
+from before positions were made canonical, started with b"RVBK".
+"""
+
+HEADER = struct.Struct("<4sBBH")
+"""
+Layout of the header of a book file: magic, board side, number of
+players, and two bytes of padding.
+"""
+
+RECORD = struct.Struct("<QBBBxi")
+"""
+Layout of a record of a book file: canonical position hash, row and
+column of the move in the canonical form, depth searched, a byte of
+padding, and the score.
+"""
+
+KEY = struct.Struct("<Q")
+"""
+Layout of the canonical position hash at the start of a record.
+"""
+
+BookEntryType = Tuple[Tuple[int, int], int, int]
+"""
+Type for an entry of the book: the move, its score from the point of
+view of the player to move, and the depth it was searched to.
+"""
+
+
+def play_book_game(seed: int, plies: int, node_limit: int,
+                   explore: float) -> List[Tuple[int, BookEntryType]]:
+    """
+    Plays the opening of one self-play game on an 8x8 board, searching
+    every position with alpha-beta. The move found is played, except
+    that with probability explore a random move is played instead, so
+    that different games reach different positions.
+
+    Inputs:
+        seed (int): seed of the random choices
+        plies (int): number of moves to play
+        node_limit (int): positions per search
+        explore (float): probability of playing a random move
+
+    Returns:
+        The (canonical key, entry) of every position searched, with
+        the move mapped to the canonical form
+    """
+    rng = random.Random(seed)
+    search = AlphaBetaSearch(time_limit=None, node_limit=node_limit)
+    game = Reversi(8, 2, True)
+    entries = []
+    for _ in range(plies):
+        if game.done:
+            break
+        result = search.search(game)
+        key, transform = game.canonical_key()
+        canonical_move = transform_position(result.move, transform, 8)
+        entries.append((key, (canonical_move, result.score, result.depth)))
+        move = result.move
+        if rng.random() < explore:
+            move = rng.choice(game.available_moves)
+        game.apply_move(move)
+    return entries
+
+
+def build_book(num_games: int, plies: int, node_limit: int,
+               explore: float, workers: int,
+               seed: int) -> Dict[int, BookEntryType]:
+    """
+    Plays num_games self-play openings on a pool of worker processes
+    (game i draws its random choices from seed + i), and collects the
+    positions searched. When a position was searched more than once,
+    the deepest search is kept (the earliest game's, for equal depths),
+    so the book only depends on the seed, not on the workers.
+
+    Returns: The entry of every position, by canonical key
+    """
+    book = {}
+    seeds = range(seed, seed + num_games)
+    args = ([plies] * num_games, [node_limit] * num_games,
+            [explore] * num_games)
+    if workers <= 1:
+        results = map(play_book_game, seeds, *args)
+        for entries in results:
+            _merge(book, entries)
+        return book
+    with ProcessPoolExecutor(workers) as executor:
+        for entries in executor.map(play_book_game, seeds, *args):
+            _merge(book, entries)
+    return book
+
+
+def _merge(book: Dict[int, BookEntryType],
+           entries: Iterable[Tuple[int, BookEntryType]]) -> None:
+    """
+    Adds entries to a book, keeping the deepest entry of a position
+    """
+    for key, entry in entries:
+        if key not in book or entry[2] > book[key][2]:
+            book[key] = entry
+
+
+def write_book(path: str, book: Dict[int, BookEntryType], side: int = 8,
+               players: int = 2) -> None:
+    """
+    Saves a book as a file of records sorted by canonical key. The
+    file is written under a temporary name and then renamed, so that
+    processes reading the old book never see a partial file.
+    """
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as file:
+        file.write(HEADER.pack(BOOK_MAGIC, side, players, 0))
+        for key in sorted(book):
+            (row, col), score, depth = book[key]
+            file.write(RECORD.pack(key, row, col, min(depth, 255), score))
+    os.replace(temp_path, path)
+
+
+class OpeningBook:
+    """
+    Class to represent an opening book file opened for lookups.
+
+    Attributes:
+        side (int): board side the book is for
+        players (int): number of players the book is for
+    """
+    side: int
+    players: int
+
+    def __init__(self, path: str):
+        """
+        Constructor
+
+        Args:
+            path: Path of the book file
+
+        Raises:
+            ValueError: If the file is not a book
+        """
+        with open(path, "rb") as file:
+            size = os.fstat(file.fileno()).st_size
+            if size < HEADER.size:
+                raise ValueError("The file is not an opening book")
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.side, self.players, _ = HEADER.unpack_from(self._map, 0)
+        if magic != BOOK_MAGIC or (size - HEADER.size) % RECORD.size != 0:
+            self._map.close()
+            raise ValueError("The file is not an opening book")
+        self._count = (size - HEADER.size) // RECORD.size
+
+    def __len__(self) -> int:
+        """
+        Returns the number of positions in the book
+        """
+        return self._count
+
+    def close(self) -> None:
+        """
+        Closes the book file
+        """
+        self._map.close()
+
+    def lookup(self, key: int) -> Optional[BookEntryType]:
+        """
+        Finds a position in the book by binary search.
+
+        Args:
+            key: Canonical key of the position
+
+        Returns: The (move, score, depth) stored for the position, or
+        None if it is not in the book.
+        """
+        low = 0
+        high = self._count
+        while low < high:
+            middle = (low + high) // 2
+            offset = HEADER.size + middle * RECORD.size
+            middle_key = KEY.unpack_from(self._map, offset)[0]
+            if middle_key < key:
+                low = middle + 1
+            elif middle_key > key:
+                high = middle
+            else:
+                _, row, col, depth, score = RECORD.unpack_from(self._map,
+                                                               offset)
+                return (row, col), score, depth
+        return None
+
+    def move_for(self, game: ReversiBase) -> Optional[Tuple[int, int]]:
+        """
+        Returns the book move for the position of a game, or None if
+        the position is not in the book (or the game is not of the
+        kind the book is for). Rotations and reflections of a book
+        position are found too.
+        """
+        if game.size != self.side or game.num_players != self.players:
+            return None
+        key, transform = game.canonical_key()
+        entry = self.lookup(key)
+        if entry is None:
+            return None
+        move = transform_position(entry[0], inverse_transform(transform),
+                                  self.side)
+        if not game.legal_move(move):
+            return None
+        return move
+
+
+if __name__ == "__main__":
+    path = "book.bin"
+    num_games = 64
+    plies = 8
+    node_limit = 20000
+    explore = 0.25
+    workers = os.cpu_count() or 1
+    seed = 0
+
+    for i, item in enumerate(sys.argv):
+        if item == "-o":
+            path = sys.argv[i + 1]
+        if item == "-g":
+            num_games = int(sys.argv[i + 1])
+        if item == "-d":
+            plies = int(sys.argv[i + 1])
+        if item == "--nodes":
+            node_limit = int(sys.argv[i + 1])
+        if item == "-w":
+            workers = int(sys.argv[i + 1])
+        if item == "-s":
+            seed = int(sys.argv[i + 1])
+
+    book = build_book(num_games, plies, node_limit, explore, workers, seed)
+    write_book(path, book)
+    print(f"Wrote {len(book)} positions to {path}")
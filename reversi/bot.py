@@ -1,98 +1,683 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import os
 import random
 import sys
-from typing import Optional, Tuple
-from reversi import Reversi
+import time
+from typing import Dict, List, Optional, Tuple, Type
+from reversi import MAX_PLAYERS, Reversi, ReversiBase
+from bitboard import BitboardReversi
+from transposition import EXACT, TranspositionTable
+from search import AlphaBetaSearch
+from mcts import MCTS
+from endgame import ENDGAME_EMPTIES, EndgameSolver
+from book import OpeningBook
+from records import GameRecord, RecordWriter
 
-def smart_bot_move(game: Reversi, player: int) -> Tuple[int, int]:
+_key_rng = random.Random("very-smart")
+SMARTER_PLAYER_KEYS = tuple(_key_rng.getrandbits(64)
+                            for _ in range(MAX_PLAYERS + 1))
+"""
+Keys mixed into the very-smart bot's table keys, one for each player,
+since the averages it stores are those of the player it moves for.
+"""
+del _key_rng
+
+
+def count_pieces(game: ReversiBase, player: int) -> int:
     """
-    Smart bot scans all available moves, creates a sim_game that counts
-    how many pieces will be on the board per available move, and returns
-    the move that yields the largest count of pieces
+    Counts how many pieces player has on the board
+    """
+    return sum(row.count(player) for row in game.grid)
+
+def smart_bot_move(game: ReversiBase, player: int) -> Tuple[int, int]:
+    """
+    Smart bot scans all available moves with the pieces each one
+    flips, and returns the move that yields the largest count of
+    pieces for player (the one that flips the most)
     """
-    moves = game.available_moves
     best_move = None
-    best_count = 0
-    for move in moves:
-        sim_game = game.simulate_moves([move])
-        count = len(sim_game._grid._location_of_pieces[player])
-        if count > best_count:
-            best_count = count
+    best_count = -1
+    for move, flips in game.moves_with_flips().items():
+        if len(flips) > best_count:
+            best_count = len(flips)
             best_move = move
     return best_move
 
-def smarter_bot_move(game: Reversi, player: int) -> Tuple[int, int]:
+def smarter_bot_move(game: ReversiBase, player: int,
+                     table: Optional[TranspositionTable] = None
+                     ) -> Tuple[int, int]:
     """
-    Smarter bot scans all available moves. For each move, it creates a sim_game
-    with the list of moves the other player has, creates another sim_game for 
-    each move the enemy has and counts average num of pieces player has 
-    after enemy moves. Then returns the move with the highest average. 
+    Smarter bot scans all available moves. For each move, it plays the
+    move, then looks at the pieces each move the other player has in
+    reply would flip, and counts the average num of pieces player has
+    after enemy moves. Then returns the move with the highest average.
+
+    If a transposition table is given, the average for each position
+    reached is stored in it under the position's canonical key (mixed
+    with a key for player), and reused when player reaches the
+    position, or any rotation or reflection of it, again.
     """
     moves = game.available_moves
     best_move = None
     best_count = 0
     for move in moves:
-        count = 0
-        sim_game = game.simulate_moves([move])
-        opponent_moves = sim_game.available_moves
-        for o_move in opponent_moves:
-            sim_game = game.simulate_moves([o_move])
-            count += len(sim_game._grid._location_of_pieces[player])
-        if len(opponent_moves) == 0:
+        game.push_move(move)
+        replies = game.moves_with_flips()
+        entry = None
+        key = None
+        if table is not None and replies:
+            key = game.canonical_key()[0] ^ SMARTER_PLAYER_KEYS[player]
+            entry = table.probe(key)
+        if entry is not None:
+            avg_count = entry[2]
+        elif replies:
+            base = count_pieces(game, player)
+            count = 0
+            for o_move, flips in replies.items():
+                if game.turn == player:
+                    count += base + 1 + len(flips)
+                else:
+                    count += base - sum(1 for pos in flips
+                                        if game.piece_at(pos) == player)
+            avg_count = count // len(replies)
+            if table is not None:
+                table.store(key, 1, EXACT, avg_count)
+        game.pop_move()
+        if len(replies) == 0:
             return move
-        else:
-            avg_count = count // len(opponent_moves)
         if avg_count > best_count:
             best_count = avg_count
             best_move = move
     return best_move
 
-num_games = 100
-player1_strat = ""
-player2_strat = ""
-
-for i, item in enumerate(sys.argv):
-    if item == "-n":
-        num_games = int(sys.argv[i + 1])
-    if item == "-1":
-        player1_strat = sys.argv[i + 1]
-    if item == "-2":
-        player2_strat = sys.argv[i + 1]
-
-curr_game = 0
-player_1_wins = 0
-player_2_wins = 0
-ties = 0
-
-while curr_game < num_games:
-    game = Reversi(8, 2, True)
-    while not game.done:
-        if game._turn == 1:
-            if player1_strat == "smart":
-                game.apply_move(smart_bot_move(game, 1))
-            elif player1_strat == "very-smart":
-                game.apply_move(smarter_bot_move(game, 1))
+def alphabeta_bot_move(game: ReversiBase, player: int,
+                       search: AlphaBetaSearch,
+                       solver: Optional[EndgameSolver] = None,
+                       book: Optional[OpeningBook] = None
+                       ) -> Tuple[int, int]:
+    """
+    Alpha-beta bot searches deeper and deeper until its time or node
+    budget runs out, and returns the best move of the deepest search.
+    Positions in the opening book are played from the book instead,
+    and once few enough squares are empty for the solver, it plays the
+    move the solver proves best.
+    """
+    move = None if book is None else book.move_for(game)
+    if move is not None:
+        return move
+    if solver is not None and solver.can_solve(game):
+        return solver.solve(game).move
+    return search.search(game).move
+
+def mcts_bot_move(game: ReversiBase, player: int, search: MCTS,
+                  solver: Optional[EndgameSolver] = None,
+                  book: Optional[OpeningBook] = None) -> Tuple[int, int]:
+    """
+    MCTS bot plays random games from the current position, steering
+    them towards the moves that have won most often, and returns the
+    move that was explored the most. Positions in the opening book are
+    played from the book instead, and once few enough squares are
+    empty for the solver, it plays the move the solver proves best.
+    """
+    move = None if book is None else book.move_for(game)
+    if move is not None:
+        return move
+    if solver is not None and solver.can_solve(game):
+        return solver.solve(game).move
+    return search.search(game)
+
+STRATEGIES = ("random", "smart", "very-smart", "alphabeta", "mcts")
+"""
+Names of the strategies a bot can play.
+"""
+
+
+class Bot:
+    """
+    Class for a bot that plays one strategy for whichever player is to
+    move, keeping what the strategy reuses from move to move: the
+    very-smart bot's transposition table, and a search and endgame
+    solver for each player (their scores are from that player's point
+    of view, so they are not shared between players).
+
+    Attributes:
+        strat (str): strategy, one of STRATEGIES
+        time_limit (float): seconds per search or endgame solver move
+            (it can be changed between moves)
+    """
+    strat: str
+    time_limit: float
+
+    def __init__(self, strat: str, time_limit: float = 0.1,
+                 megabytes: float = 4,
+                 endgame_empties: int = ENDGAME_EMPTIES,
+                 book: Optional[OpeningBook] = None,
+                 rng: Optional[random.Random] = None):
+        """
+        Constructor
+
+        Args:
+            strat: Strategy to play, one of STRATEGIES
+            time_limit: Seconds per move of the alpha-beta and MCTS bots
+            megabytes: Memory for each transposition table
+            endgame_empties: Empty squares at or below which the search
+            bots switch to the endgame solver
+            book: Opening book for the search bots, or None
+            rng: Generator for the random bot's moves
+
+        Raises:
+            ValueError: If strat is not a known strategy
+        """
+        if strat not in STRATEGIES:
+            raise ValueError(f"Unknown strategy {strat!r}")
+        self.strat = strat
+        self.time_limit = time_limit
+        self._megabytes = megabytes
+        self._endgame_empties = endgame_empties
+        self._book = book
+        self._rng = random.Random() if rng is None else rng
+        self._table = None
+        if strat == "very-smart":
+            self._table = TranspositionTable(megabytes)
+        self._searches = {}
+        self._solvers = {}
+
+    def move(self, game: ReversiBase) -> Tuple[int, int]:
+        """
+        Returns the move the bot plays for the player whose turn it
+        is. The game must not be over.
+        """
+        player = game.turn
+        if self.strat == "random":
+            return self._rng.choice(game.available_moves)
+        if self.strat == "smart":
+            return smart_bot_move(game, player)
+        if self.strat == "very-smart":
+            return smarter_bot_move(game, player, self._table)
+
+        if player not in self._searches:
+            if self.strat == "alphabeta":
+                self._searches[player] = AlphaBetaSearch(
+                    self.time_limit,
+                    table=TranspositionTable(self._megabytes))
             else:
-                game.apply_move(random.choice(game.available_moves))
-        if game._turn == 2:
-            if player2_strat == "smart":
-                game.apply_move(smart_bot_move(game, 2))
-            elif player2_strat == "very-smart":
-                game.apply_move(smarter_bot_move(game, 2))
+                self._searches[player] = MCTS(None, self.time_limit,
+                                              rng=self._rng)
+            self._solvers[player] = EndgameSolver(self._endgame_empties)
+        self._searches[player].time_limit = self.time_limit
+        self._solvers[player].time_limit = self.time_limit
+        if self.strat == "alphabeta":
+            return alphabeta_bot_move(game, player, self._searches[player],
+                                      self._solvers[player], self._book)
+        return mcts_bot_move(game, player, self._searches[player],
+                             self._solvers[player], self._book)
+
+SHARD_GAMES = 16
+"""
+Number of games each task of a parallel match plays. Shards are the
+same whatever the number of workers, so a match played with a given
+seed has the same results on any machine.
+"""
+
+
+BATCH_GAMES = 4096
+"""
+Number of games each task of a vectorized random match plays at once.
+"""
+
+
+class MatchSettings:
+    """
+    Class to represent how the games of a match are played.
+
+    Attributes:
+        strats (dict): strategy of each player
+        engine (type): Reversi engine to play on
+        megabytes (float): size of the transposition tables, or None
+        time_limit (float): seconds per search or endgame solver move,
+            or None
+        node_limit (int): positions per alpha-beta move, or None
+        num_playouts (int): playouts per MCTS move, or None
+        vectorized (bool): whether to play random-vs-random games
+            in NumPy batches instead of one at a time
+        endgame_empties (int): number of empty squares at or below
+            which the search bots solve the game exactly (0 to never)
+        book_path (str): opening book file for the search bots, or None
+        external (bool): whether to run the strategies as engine
+            processes (see engine.py) instead of in the match process
+        record (bool): whether to keep a record of every game
+    """
+    strats: Dict[int, str]
+    engine: Type[ReversiBase]
+    megabytes: Optional[float]
+    time_limit: Optional[float]
+    node_limit: Optional[int]
+    num_playouts: Optional[int]
+    vectorized: bool
+    endgame_empties: int
+    book_path: Optional[str]
+    external: bool
+    record: bool
+
+    def __init__(self, strats: Dict[int, str], engine: Type[ReversiBase],
+                 megabytes: Optional[float], time_limit: Optional[float],
+                 node_limit: Optional[int], num_playouts: Optional[int],
+                 vectorized: bool = False,
+                 endgame_empties: int = ENDGAME_EMPTIES,
+                 book_path: Optional[str] = None, external: bool = False,
+                 record: bool = False):
+        self.strats = strats
+        self.engine = engine
+        self.megabytes = megabytes
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.num_playouts = num_playouts
+        self.vectorized = vectorized
+        self.endgame_empties = endgame_empties
+        self.book_path = book_path
+        self.external = external
+        self.record = record
+
+
+class MatchResult:
+    """
+    Class to tally the games of a match, and how much searching
+    the bots did.
+
+    Attributes:
+        games (int): number of games played
+        player_1_wins (int): games won by player 1
+        player_2_wins (int): games won by player 2
+        ties (int): games tied
+        nodes (dict): positions searched by each alpha-beta player
+        playouts (dict): playouts made by each MCTS player
+        seconds (dict): time spent searching by each player
+        endgame_nodes (dict): positions solved by each player's
+            endgame solver
+        endgame_seconds (dict): time spent solving by each player
+        fallback_moves (dict): moves played at random for each player
+            because its engine process hung or failed
+        table_stats (list): hits, misses and collisions of the
+            very-smart bots' transposition tables
+        records (list): binary record of every game (see records.py),
+            if the match keeps them
+    """
+    games: int
+    player_1_wins: int
+    player_2_wins: int
+    ties: int
+    nodes: Dict[int, int]
+    playouts: Dict[int, int]
+    seconds: Dict[int, float]
+    endgame_nodes: Dict[int, int]
+    endgame_seconds: Dict[int, float]
+    fallback_moves: Dict[int, int]
+    table_stats: List[int]
+    records: List[bytes]
+
+    def __init__(self):
+        self.games = 0
+        self.player_1_wins = 0
+        self.player_2_wins = 0
+        self.ties = 0
+        self.nodes = {1: 0, 2: 0}
+        self.playouts = {1: 0, 2: 0}
+        self.seconds = {1: 0.0, 2: 0.0}
+        self.endgame_nodes = {1: 0, 2: 0}
+        self.endgame_seconds = {1: 0.0, 2: 0.0}
+        self.fallback_moves = {1: 0, 2: 0}
+        self.table_stats = [0, 0, 0]
+        self.records = []
+
+    def add_outcome(self, outcome: List[int]) -> None:
+        """
+        Tallies the outcome of one game
+        """
+        self.games += 1
+        if outcome == [1]:
+            self.player_1_wins += 1
+        if outcome == [2]:
+            self.player_2_wins += 1
+        if outcome == [1, 2]:
+            self.ties += 1
+
+    def add(self, other: "MatchResult") -> None:
+        """
+        Adds the tallies of another part of the match
+        """
+        self.games += other.games
+        self.player_1_wins += other.player_1_wins
+        self.player_2_wins += other.player_2_wins
+        self.ties += other.ties
+        for player in (1, 2):
+            self.nodes[player] += other.nodes[player]
+            self.playouts[player] += other.playouts[player]
+            self.seconds[player] += other.seconds[player]
+            self.endgame_nodes[player] += other.endgame_nodes[player]
+            self.endgame_seconds[player] += other.endgame_seconds[player]
+            self.fallback_moves[player] += other.fallback_moves[player]
+        for i, value in enumerate(other.table_stats):
+            self.table_stats[i] += value
+        self.records += other.records
+
+
+def play_games(num_games: int, seed: int,
+               settings: MatchSettings) -> MatchResult:
+    """
+    Plays a number of games between the two players' strategies,
+    with every random choice drawn from a generator seeded with seed
+    """
+    rng = random.Random(seed)
+    table = None
+    if settings.megabytes is not None:
+        table = TranspositionTable(settings.megabytes)
+    book = None
+    if settings.book_path is not None:
+        book = OpeningBook(settings.book_path)
+    searches = {}
+    tree_searches = {}
+    solvers = {}
+    for player in (1, 2):
+        searches[player] = AlphaBetaSearch(settings.time_limit,
+            settings.node_limit, table=None if settings.megabytes is None
+            else TranspositionTable(settings.megabytes))
+        tree_searches[player] = MCTS(settings.num_playouts,
+            settings.time_limit if settings.num_playouts is None else None,
+            rng=rng)
+        solvers[player] = EndgameSolver(settings.endgame_empties,
+                                        time_limit=settings.time_limit)
+
+    result = MatchResult()
+    for _ in range(num_games):
+        game = settings.engine(8, 2, True)
+        moves = []
+        while not game.done:
+            player = game.turn
+            strat = settings.strats[player]
+            if strat == "smart":
+                move = smart_bot_move(game, player)
+            elif strat == "very-smart":
+                move = smarter_bot_move(game, player, table)
+            elif strat == "alphabeta":
+                move = alphabeta_bot_move(game, player, searches[player],
+                                          solvers[player], book)
+            elif strat == "mcts":
+                move = mcts_bot_move(game, player, tree_searches[player],
+                                     solvers[player], book)
             else:
-                game.apply_move(random.choice(game.available_moves))
-    if game.outcome == [1]:
-        player_1_wins += 1
-    if game.outcome == [2]:
-        player_2_wins += 1
-    if game.outcome == [1,2]:    
-        ties += 1 
-    curr_game += 1
-
-
-
-p1 = float("{:.2f}".format(player_1_wins / num_games * 100))
-p2 = float("{:.2f}".format(player_2_wins / num_games * 100))
-ties_percent = float("{:.2f}".format(ties / num_games * 100))
-print(f"Player 1 wins:  {p1}%")
-print(f"Player 2 wins:  {p2}%")
-print(f"Ties:  {ties_percent}%")
\ No newline at end of file
+                move = rng.choice(game.available_moves)
+            game.apply_move(move)
+            moves.append(move)
+        result.add_outcome(game.outcome)
+        if settings.record:
+            result.records.append(
+                GameRecord.from_moves(8, 2, True, moves).encode())
+
+    for player in (1, 2):
+        result.nodes[player] = searches[player].total_nodes
+        result.playouts[player] = tree_searches[player].total_playouts
+        result.seconds[player] = (searches[player].total_seconds +
+                                  tree_searches[player].total_seconds)
+        result.endgame_nodes[player] = solvers[player].total_nodes
+        result.endgame_seconds[player] = solvers[player].total_seconds
+    if table is not None:
+        result.table_stats = [table.hits, table.misses, table.collisions]
+    if book is not None:
+        book.close()
+    return result
+
+
+_engine_pool = None
+"""
+Engine processes of a match process, kept warm from shard to shard.
+"""
+
+
+def play_external_games(num_games: int, seed: int,
+                        settings: MatchSettings) -> MatchResult:
+    """
+    Plays a number of games with each player's strategy running as an
+    engine process, taken from a pool of warm engines for each game.
+    The time each player's engine takes to answer is tallied as its
+    search time. The engines draw their own random choices, so unlike
+    the other modes the games do not follow from seed.
+
+    An engine that hangs or fails is stopped, the move is played at
+    random in its place, and a fresh engine plays the next move.
+    """
+    # imported here, since engine.py imports this module
+    from engine import EnginePool
+
+    global _engine_pool
+    if _engine_pool is None:
+        _engine_pool = EnginePool(settings.engine is BitboardReversi)
+    rng = random.Random(seed)
+    result = MatchResult()
+    for _ in range(num_games):
+        engines = {1: None, 2: None}
+        game = settings.engine(8, 2, True)
+        moves = []
+        try:
+            while not game.done:
+                player = game.turn
+                engine = engines[player]
+                start = time.perf_counter()
+                try:
+                    if engine is None:
+                        engine = _engine_pool.acquire(
+                            settings.strats[player] or "random")
+                        engines[player] = engine
+                    move = engine.best_move(game, settings.time_limit)
+                except (TimeoutError, ConnectionError):
+                    if engine is not None:
+                        engine.close()
+                    engines[player] = None
+                    move = rng.choice(game.available_moves)
+                    result.fallback_moves[player] += 1
+                result.seconds[player] += time.perf_counter() - start
+                game.apply_move(move)
+                moves.append(move)
+        finally:
+            for engine in engines.values():
+                if engine is not None:
+                    _engine_pool.release(engine)
+        result.add_outcome(game.outcome)
+        if settings.record:
+            result.records.append(
+                GameRecord.from_moves(8, 2, True, moves).encode())
+    return result
+
+
+def play_random_batch(num_games: int, seed: int,
+                      settings: MatchSettings) -> MatchResult:
+    """
+    Plays a number of random-vs-random games all at once on a
+    ReversiBatch. Every ply, each game picks one of its legal moves
+    uniformly at random straight from the batch's legal-move masks,
+    just as random.choice(game.available_moves) would.
+    """
+    # imported here so that NumPy is only needed for this mode
+    import numpy as np
+    from batch import ReversiBatch
+
+    rng = np.random.default_rng(seed)
+    games = ReversiBatch(num_games, 8, 2, True)
+    plies = []
+    while not games.done.all():
+        # the legal square with the highest random key is a uniform
+        # choice among the legal squares
+        keys = rng.random(games.legal.shape) * games.legal
+        squares = keys.reshape(num_games, -1).argmax(axis=1)
+        if settings.record:
+            plies.append(np.where(games.done, -1, squares))
+        games.apply_moves(squares)
+
+    winners = games.winners()
+    result = MatchResult()
+    if settings.record:
+        moves = np.array(plies, dtype=np.int16).T
+        for squares in moves:
+            squares = squares[squares >= 0].astype(np.uint8).tobytes()
+            result.records.append(GameRecord(8, 2, True, squares).encode())
+    result.games = num_games
+    result.player_1_wins = int((winners[:, 0] & ~winners[:, 1]).sum())
+    result.player_2_wins = int((winners[:, 1] & ~winners[:, 0]).sum())
+    result.ties = int((winners[:, 0] & winners[:, 1]).sum())
+    return result
+
+
+def run_match(num_games: int, settings: MatchSettings, workers: int,
+              seed: int,
+              writer: Optional[RecordWriter] = None) -> MatchResult:
+    """
+    Plays a match in shards of SHARD_GAMES games (BATCH_GAMES if the
+    match is vectorized), spread over a pool of worker processes,
+    adding up each shard's result as it arrives. Shard i draws its
+    random choices from seed + i.
+
+    If a writer is given (and the settings record games), each shard's
+    game records are written out as it arrives rather than kept in
+    the total.
+    """
+    play = play_games
+    shard_games = SHARD_GAMES
+    if settings.external:
+        play = play_external_games
+    if settings.vectorized:
+        play = play_random_batch
+        shard_games = BATCH_GAMES
+    shards = [min(shard_games, num_games - start)
+              for start in range(0, num_games, shard_games)]
+    total = MatchResult()
+    if workers <= 1:
+        for i, size in enumerate(shards):
+            _add_shard(total, play(size, seed + i, settings), writer)
+        return total
+    with ProcessPoolExecutor(workers) as executor:
+        futures = [executor.submit(play, size, seed + i, settings)
+                   for i, size in enumerate(shards)]
+        for future in as_completed(futures):
+            _add_shard(total, future.result(), writer)
+    return total
+
+
+def _add_shard(total: MatchResult, result: MatchResult,
+               writer: Optional[RecordWriter]) -> None:
+    """
+    Adds a shard's result to the total, writing out its records
+    """
+    if writer is not None:
+        writer.write_encoded(result.records)
+        result.records = []
+    total.add(result)
+
+
+if __name__ == "__main__":
+    num_games = 100
+    player1_strat = ""
+    player2_strat = ""
+    engine = Reversi
+    megabytes = None
+    time_limit = 0.1
+    node_limit = None
+    num_playouts = None
+    workers = os.cpu_count() or 1
+    seed = random.randrange(2**32)
+    vectorized = False
+    endgame_empties = ENDGAME_EMPTIES
+    book_path = None
+    external = False
+    record_path = None
+
+    for i, item in enumerate(sys.argv):
+        if item == "-n":
+            num_games = int(sys.argv[i + 1])
+        if item == "-1":
+            player1_strat = sys.argv[i + 1]
+        if item == "-2":
+            player2_strat = sys.argv[i + 1]
+        if item == "-e" and sys.argv[i + 1] == "bitboard":
+            engine = BitboardReversi
+        if item == "-m":
+            megabytes = float(sys.argv[i + 1])
+        if item == "-t":
+            time_limit = float(sys.argv[i + 1])
+        if item == "--nodes":
+            node_limit = int(sys.argv[i + 1])
+            time_limit = None
+        if item == "-p":
+            num_playouts = int(sys.argv[i + 1])
+        if item == "-w":
+            workers = int(sys.argv[i + 1])
+        if item == "-s":
+            seed = int(sys.argv[i + 1])
+        if item == "-v":
+            vectorized = True
+        if item == "--endgame":
+            endgame_empties = int(sys.argv[i + 1])
+        if item == "-b":
+            book_path = sys.argv[i + 1]
+        if item == "--external":
+            external = True
+        if item == "-o":
+            record_path = sys.argv[i + 1]
+
+    if vectorized and not {player1_strat, player2_strat} <= {"", "random"}:
+        print("Vectorized playouts need two random players, "
+              "playing one game at a time instead")
+        vectorized = False
+    if external and (time_limit is None or vectorized or
+                     book_path is not None):
+        print("External engines play with a time limit and no book, "
+              "playing in this process instead")
+        external = False
+
+    settings = MatchSettings({1: player1_strat, 2: player2_strat}, engine,
+                             megabytes, time_limit, node_limit, num_playouts,
+                             vectorized, endgame_empties, book_path,
+                             external, record_path is not None)
+    writer = None
+    if record_path is not None:
+        writer = RecordWriter(record_path)
+    try:
+        result = run_match(num_games, settings, workers, seed, writer)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    p1 = float("{:.2f}".format(result.player_1_wins / num_games * 100))
+    p2 = float("{:.2f}".format(result.player_2_wins / num_games * 100))
+    ties_percent = float("{:.2f}".format(result.ties / num_games * 100))
+    print(f"Player 1 wins:  {p1}%")
+    print(f"Player 2 wins:  {p2}%")
+    print(f"Ties:  {ties_percent}%")
+    if megabytes is not None and "very-smart" in (player1_strat,
+                                                  player2_strat):
+        hits, misses, collisions = result.table_stats
+        print(f"Table: {hits} hits, {misses} misses, "
+              f"{collisions} collisions")
+    for player, strat in ((1, player1_strat), (2, player2_strat)):
+        seconds = result.seconds[player]
+        if external:
+            print(f"Player {player} engine: {seconds:.2f} s")
+            if result.fallback_moves[player] > 0:
+                print(f"Player {player} engine failed on "
+                      f"{result.fallback_moves[player]} moves, played "
+                      "at random")
+            continue
+        if strat == "alphabeta":
+            nodes = result.nodes[player]
+            rate = nodes / seconds if seconds > 0 else 0.0
+            print(f"Player {player} search: {nodes} nodes, "
+                  f"{rate:.0f} nodes/s")
+        if strat == "mcts":
+            playouts = result.playouts[player]
+            rate = playouts / seconds if seconds > 0 else 0.0
+            print(f"Player {player} search: {playouts} "
+                  f"playouts, {rate:.0f} playouts/s")
+        nodes = result.endgame_nodes[player]
+        if nodes > 0:
+            seconds = result.endgame_seconds[player]
+            rate = nodes / seconds if seconds > 0 else 0.0
+            print(f"Player {player} endgame: {nodes} nodes, "
+                  f"{rate:.0f} nodes/s")
@@ -0,0 +1,429 @@
+"""
+Exact endgame solver for Reversi.
+
+Once only a few squares are left empty, the rest of the game can be
+searched to the very end instead of estimated. The solver works with
+any ReversiBase engine through push_move/pop_move, and scores games by
+their final disc differential: the searching player's pieces minus
+those of the best of the other players. As in the alpha-beta search,
+the searching player maximizes and every other player minimizes.
+
+Moves are ordered by parity (moves in a quadrant with an odd number
+of empty squares first, so that the mover tends to get the last move
+there) and, while enough squares are empty for it to pay off, fastest
+first (the moves that leave the next player the fewest replies first).
+Results are kept in a small transposition table of the solver's own.
+A solve can be given a time limit, after which it stops and returns
+the best move proven so far.
+
+Run as a script, compares exact and win/loss/draw solves of random
+positions with a given number of empty squares, to help choose how
+early the bots should switch to the solver.
+
+Usage:
+    python endgame.py [-n num_positions] [--empties empties]
+                      [-e bitboard] [-s seed]
+"""
+import random
+import sys
+import time
+from typing import Optional, Tuple, Type
+
+from reversi import ListMovesType, Reversi, ReversiBase
+from bitboard import BitboardReversi
+from search import SearchTimeout
+from transposition import EXACT, LOWER, UPPER, TranspositionTable
+
+
+ENDGAME_EMPTIES = 10
+"""
+Default number of empty squares at or below which the search bots
+switch to the endgame solver.
+"""
+
+FASTEST_FIRST_EMPTIES = 6
+"""
+Number of empty squares above which moves are ordered fastest first.
+Closer to the end, counting every reply costs more than it saves.
+"""
+
+
+def empty_squares(game: ReversiBase) -> ListMovesType:
+    """
+    Returns the positions of the empty squares of a game
+    """
+    return [(row, col) for row, values in enumerate(game.grid)
+            for col, value in enumerate(values) if value is None]
+
+
+class EndgameResult:
+    """
+    Class to represent the result of an endgame solve.
+
+    Attributes:
+        move (tuple): best move
+        score (int): final disc differential for the searching
+            player after the best play of every player
+        nodes (int): number of positions visited
+        seconds (float): time taken by the solve
+        complete (bool): whether the solve finished within its time
+            limit. If not, move is the best of the moves solved in
+            time (or the first move to solve, if none was), and score
+            is only a lower bound.
+    """
+    move: Tuple[int, int]
+    score: int
+    nodes: int
+    seconds: float
+    complete: bool
+
+    def __init__(self, move: Tuple[int, int], score: int, nodes: int,
+                 seconds: float, complete: bool = True):
+        self.move = move
+        self.score = score
+        self.nodes = nodes
+        self.seconds = seconds
+        self.complete = complete
+
+    @property
+    def nodes_per_second(self) -> float:
+        """
+        Returns the number of positions visited per second
+        """
+        return self.nodes / self.seconds if self.seconds > 0 else 0.0
+
+
+class EndgameSolver:
+    """
+    Class for an exact endgame solver.
+
+    Attributes:
+        max_empties (int): largest number of empty squares the bots
+            hand over to the solver (solve itself accepts any position)
+        time_limit (float): seconds per solve, or None for no limit
+        table (TranspositionTable): table of solved positions. Scores
+            are stored from the searching player's point of view, so
+            a solver should not be shared between players.
+        total_nodes (int): positions visited over all solves
+        total_seconds (float): time taken by all solves
+    """
+    max_empties: int
+    time_limit: Optional[float]
+    table: TranspositionTable
+    total_nodes: int
+    total_seconds: float
+
+    def __init__(self, max_empties: int = ENDGAME_EMPTIES,
+                 megabytes: float = 4, time_limit: Optional[float] = None):
+        """
+        Constructor
+
+        Args:
+            max_empties: Largest number of empty squares the bots
+            hand over to the solver
+            megabytes: Memory to use for the transposition table
+            time_limit: Seconds per solve, or None for no limit
+
+        Raises:
+            ValueError: If megabytes is not positive
+        """
+        self.max_empties = max_empties
+        self.time_limit = time_limit
+        self.table = TranspositionTable(megabytes)
+        self.total_nodes = 0
+        self.total_seconds = 0.0
+        self._player = 1
+        self._nodes = 0
+        self._deadline = None
+        self._num_empties = 0
+        self._quadrant_empties = [0] * 4
+        self._half = 0
+
+    @property
+    def nodes_per_second(self) -> float:
+        """
+        Returns the number of positions visited per second over
+        all solves
+        """
+        if self.total_seconds <= 0:
+            return 0.0
+        return self.total_nodes / self.total_seconds
+
+    def can_solve(self, game: ReversiBase) -> bool:
+        """
+        Returns True if a game has at most max_empties empty squares
+        """
+        return sum(row.count(None) for row in game.grid) <= self.max_empties
+
+    def solve(self, game: ReversiBase) -> EndgameResult:
+        """
+        Finds the best move for the player whose turn it is, and the
+        final disc differential it leads to.
+
+        The game is modified during the solve, but is restored
+        to its original state before returning.
+
+        Args:
+            game: Game to solve. Must not be over.
+
+        Returns: The best move and its score (or, if the time limit
+        ran out, the best move found in time; see EndgameResult).
+        """
+        limit = game.size * game.size + 1
+        return self._solve_root(game, -limit, limit)
+
+    def solve_wld(self, game: ReversiBase) -> EndgameResult:
+        """
+        Finds whether the player whose turn it is wins, draws or loses
+        with best play, without working out by how much.
+
+        The search uses the narrowest window around a draw, (-1, 1), so
+        any line that is clearly won or lost is cut off as soon as it is
+        proven, which visits far fewer positions than solve.
+
+        The game is modified during the solve, but is restored
+        to its original state before returning.
+
+        Args:
+            game: Game to solve. Must not be over.
+
+        Returns: A winning move if there is one (otherwise a drawing
+        move if there is one, otherwise any move), with a score of 1
+        for a win, 0 for a draw and -1 for a loss.
+        """
+        result = self._solve_root(game, -1, 1)
+        result.score = max(-1, min(1, result.score))
+        return result
+
+    def _solve_root(self, game: ReversiBase, alpha: int,
+                    beta: int) -> EndgameResult:
+        """
+        Searches every move at the root with the window (alpha, beta)
+
+        Returns: The best move, with the exact final disc differential
+        if it lies strictly between alpha and beta, or a bound on it on
+        the same side of the window otherwise.
+        """
+        start = time.perf_counter()
+        self._player = game.turn
+        self._nodes = 0
+        self._deadline = None
+        if self.time_limit is not None:
+            self._deadline = start + self.time_limit
+        self._half = game.size // 2
+        empties = empty_squares(game)
+        self._num_empties = len(empties)
+        self._quadrant_empties = [0] * 4
+        for pos in empties:
+            self._quadrant_empties[self._quadrant(pos)] += 1
+
+        moves = self._ordered_moves(game, None)
+        best = -game.size * game.size - 1
+        best_move = moves[0]
+        complete = True
+        for move in moves:
+            self._play(game, move)
+            try:
+                score = self._search(game, alpha, beta)
+            except SearchTimeout:
+                complete = False
+                break
+            finally:
+                self._unplay(game, move)
+            if score > best:
+                best = score
+                best_move = move
+                alpha = max(alpha, score)
+                if alpha >= beta:
+                    break
+
+        seconds = time.perf_counter() - start
+        self.total_nodes += self._nodes
+        self.total_seconds += seconds
+        return EndgameResult(best_move, best, self._nodes, seconds, complete)
+
+    def _quadrant(self, pos: Tuple[int, int]) -> int:
+        """
+        Returns which quadrant of the board a position is in
+        """
+        return (pos[0] >= self._half) * 2 + (pos[1] >= self._half)
+
+    def _play(self, game: ReversiBase, move: Tuple[int, int]) -> None:
+        """
+        Plays a move, keeping the empty square counts up to date
+        """
+        game.push_move(move)
+        self._num_empties -= 1
+        self._quadrant_empties[self._quadrant(move)] -= 1
+
+    def _unplay(self, game: ReversiBase, move: Tuple[int, int]) -> None:
+        """
+        Undoes a move made with _play
+        """
+        game.pop_move()
+        self._num_empties += 1
+        self._quadrant_empties[self._quadrant(move)] += 1
+
+    def _ordered_moves(self, game: ReversiBase,
+                       first: Optional[Tuple[int, int]]) -> ListMovesType:
+        """
+        Returns the available moves in the order they should be
+        searched: first (if it is one of them), then by how many
+        replies they leave while enough squares are empty, and by
+        parity
+        """
+        moves = game.available_moves
+        quadrant_empties = self._quadrant_empties
+        if self._num_empties > FASTEST_FIRST_EMPTIES:
+            maximizing = game.turn == self._player
+            keys = {}
+            for move in moves:
+                self._play(game, move)
+                replies = 0
+                if not game.done and (game.turn == self._player) != maximizing:
+                    replies = len(game.available_moves)
+                self._unplay(game, move)
+                keys[move] = (replies,
+                              quadrant_empties[self._quadrant(move)] % 2 == 0)
+            moves.sort(key=keys.__getitem__)
+        else:
+            moves.sort(key=lambda move:
+                       quadrant_empties[self._quadrant(move)] % 2 == 0)
+        if first in moves:
+            moves.remove(first)
+            moves.insert(0, first)
+        return moves
+
+    def _search(self, game: ReversiBase, alpha: int, beta: int) -> int:
+        """
+        Solves a position.
+
+        Returns: The final disc differential of the position, if it
+        lies strictly between alpha and beta; otherwise a bound on it
+        on the same side of the window.
+        """
+        self._nodes += 1
+        if (self._deadline is not None and self._nodes % 256 == 0
+                and time.perf_counter() >= self._deadline):
+            raise SearchTimeout
+        if game.done:
+            return self._final_score(game)
+
+        alpha_orig = alpha
+        beta_orig = beta
+        key = game.position_hash
+        table_move = None
+        entry = self.table.probe(key)
+        if entry is not None:
+            _, flag, score, table_move = entry
+            if flag == EXACT:
+                return score
+            if flag == LOWER:
+                alpha = max(alpha, score)
+            elif flag == UPPER:
+                beta = min(beta, score)
+            if alpha >= beta:
+                return score
+
+        moves = self._ordered_moves(game, table_move)
+        maximizing = game.turn == self._player
+        limit = game.size * game.size + 1
+        best = -limit if maximizing else limit
+        best_move = moves[0]
+        for move in moves:
+            self._play(game, move)
+            try:
+                score = self._search(game, alpha, beta)
+            finally:
+                self._unplay(game, move)
+            if maximizing and score > best or not maximizing and score < best:
+                best = score
+                best_move = move
+                if maximizing:
+                    alpha = max(alpha, score)
+                else:
+                    beta = min(beta, score)
+                if alpha >= beta:
+                    break
+
+        if best <= alpha_orig:
+            flag = UPPER
+        elif best >= beta_orig:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.table.store(key, self._num_empties, flag, best, best_move)
+        return best
+
+    def _final_score(self, game: ReversiBase) -> int:
+        """
+        Returns the final disc differential of a finished game for
+        the searching player
+        """
+        counts = [0] * (game.num_players + 1)
+        for row in game.grid:
+            for value in row:
+                if value is not None:
+                    counts[value] += 1
+        own = counts[self._player]
+        return own - max(count for player, count in enumerate(counts)
+                         if player not in (0, self._player))
+
+
+def random_endgame(engine: Type[ReversiBase], empties: int,
+                   rng: random.Random) -> Optional[ReversiBase]:
+    """
+    Plays random moves on an 8x8 board until at most empties squares
+    are empty, returning the game, or None if it ended before that
+    """
+    game = engine(8, 2, True)
+    while not game.done and len(empty_squares(game)) > empties:
+        game.apply_move(rng.choice(game.available_moves))
+    return None if game.done else game
+
+
+if __name__ == "__main__":
+    num_positions = 10
+    empties = ENDGAME_EMPTIES
+    engine = Reversi
+    seed = 0
+
+    for i, item in enumerate(sys.argv):
+        if item == "-n":
+            num_positions = int(sys.argv[i + 1])
+        if item == "--empties":
+            empties = int(sys.argv[i + 1])
+        if item == "-e" and sys.argv[i + 1] == "bitboard":
+            engine = BitboardReversi
+        if item == "-s":
+            seed = int(sys.argv[i + 1])
+
+    rng = random.Random(seed)
+    games = []
+    while len(games) < num_positions:
+        game = random_endgame(engine, empties, rng)
+        if game is not None:
+            games.append(game)
+
+    totals = {}
+    for name in ("exact", "wld"):
+        nodes = 0
+        seconds = 0.0
+        for game in games:
+            # a fresh solver for each position, so that no results
+            # carry over from one solve to the next
+            solver = EndgameSolver()
+            if name == "exact":
+                result = solver.solve(game)
+            else:
+                result = solver.solve_wld(game)
+            nodes += result.nodes
+            seconds += result.seconds
+        totals[name] = seconds
+        rate = nodes / seconds if seconds > 0 else 0.0
+        print(f"{name:>5}: {nodes / len(games):10.0f} nodes "
+              f"{seconds * 1000 / len(games):10.1f} ms per position "
+              f"({rate:.0f} nodes/s)")
+    if totals["wld"] > 0:
+        print(f"WLD is {totals['exact'] / totals['wld']:.1f}x faster "
+              f"with {empties} empties")
@@ -0,0 +1,394 @@
+"""
+Text protocol for running Reversi bots as external processes.
+
+An engine reads commands from its standard input, one per line, and
+writes its answers to its standard output, in the spirit of UCI and GTP:
+
+    isready
+        Answered with "readyok" once the engine has handled every
+        earlier command.
+    position <side> <players> <othello> <turn> <cells>
+        Sets the position to search. othello is 1 or 0, and cells lists
+        the board row by row, one character per square: "." for an
+        empty square, or the digit of the player who owns it. Not
+        answered; a bad position is reported by the next go.
+    go <milliseconds>
+        Answered with "bestmove <row> <col>", the move the engine plays
+        in the position within the given time budget, "bestmove none"
+        if the game is over, or "error <message>".
+    quit
+        Ends the engine.
+
+Any strategy of bot.py can be run as an engine, and EnginePool keeps
+engine processes warm and hands them out game after game, so a slow or
+leaky strategy runs (and is timed) in a process of its own without
+paying for a process start on every game.
+
+Usage:
+    python engine.py <strategy> [-e bitboard]
+        Runs a bot as an engine on standard input and output
+    python engine.py --roundtrip [-n num_moves]
+        Measures the time a move request to a warm engine takes,
+        beyond the time spent choosing the move
+"""
+import os
+import select
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, TextIO, Tuple, Type
+
+from reversi import BoardGridType, Reversi, ReversiBase
+from bitboard import BitboardReversi
+from bot import STRATEGIES, Bot
+
+
+ENGINE_SCRIPT = __file__
+"""
+Path of the script engine processes run.
+"""
+
+REPLY_MARGIN = 1.0
+"""
+Seconds an engine may take beyond its time budget before it is
+considered hung and stopped.
+"""
+
+READ_SIZE = 4096
+"""
+Bytes read from an engine's output at a time.
+"""
+
+
+def encode_position(game: ReversiBase, othello: bool = True) -> str:
+    """
+    Returns the position command for the position of a game, which
+    was started from an Othello configuration if othello is True
+    """
+    cells = "".join("." if value is None else str(value)
+                    for row in game.grid for value in row)
+    return (f"position {game.size} {game.num_players} {int(othello)} "
+            f"{game.turn} {cells}")
+
+
+def decode_position(words: List[str],
+                    engine: Type[ReversiBase]) -> ReversiBase:
+    """
+    Builds a game from the arguments of a position command
+
+    Inputs:
+        words (list): the words of the command after "position"
+        engine (type): engine class to build the game with
+
+    Returns:
+        The game
+
+    Raises:
+        ValueError: If the arguments do not describe a valid position
+    """
+    if len(words) != 5:
+        raise ValueError("position takes side, players, othello, turn "
+                         "and cells")
+    side, players, othello, turn = (int(word) for word in words[:4])
+    cells = words[4]
+    if len(cells) != side * side:
+        raise ValueError("cells does not match the side of the board")
+    grid: BoardGridType = []
+    for row in range(side):
+        grid.append([None if value == "." else int(value)
+                     for value in cells[row * side:(row + 1) * side]])
+    game = engine(side, players, othello == 1)
+    game.load_game(turn, grid)
+    return game
+
+
+def run_engine(strat: str, engine: Type[ReversiBase], commands: TextIO,
+               replies: TextIO) -> None:
+    """
+    Answers protocol commands with a bot until quit or the end of the
+    commands
+
+    Inputs:
+        strat (str): strategy of the bot, one of bot.STRATEGIES
+        engine (type): engine class to build positions with
+        commands (file): stream the commands are read from
+        replies (file): stream the answers are written to
+
+    Returns:
+        Nothing
+    """
+    bot = Bot(strat)
+    game = None
+    position_error = "no position set"
+    while True:
+        line = commands.readline()
+        if not line:
+            break
+        words = line.split()
+        if not words:
+            continue
+        command = words[0]
+        reply = None
+        if command == "quit":
+            break
+        if command == "isready":
+            reply = "readyok"
+        elif command == "position":
+            try:
+                game = decode_position(words[1:], engine)
+                position_error = None
+            except ValueError as error:
+                game = None
+                position_error = str(error)
+        elif command == "go":
+            if game is None:
+                reply = f"error {position_error}"
+            elif len(words) > 1 and not words[1].isdigit():
+                reply = "error go takes a time budget in milliseconds"
+            elif game.done:
+                reply = "bestmove none"
+            else:
+                if len(words) > 1:
+                    bot.time_limit = int(words[1]) / 1000
+                row, col = bot.move(game)
+                reply = f"bestmove {row} {col}"
+        else:
+            reply = f"error unknown command {command}"
+        if reply is not None:
+            replies.write(reply + "\n")
+            replies.flush()
+
+
+class EngineProcess:
+    """
+    Class for a bot running as an engine in a process of its own.
+
+    Attributes:
+        strat (str): strategy the engine plays
+        moves (int): moves the engine has been asked for
+    """
+    strat: str
+    moves: int
+
+    def __init__(self, strat: str, bitboard: bool = False):
+        """
+        Constructor. Starts the engine and waits until it is ready.
+
+        Args:
+            strat: Strategy to play, one of bot.STRATEGIES
+            bitboard: Whether the engine searches on BitboardReversi
+
+        Raises:
+            ValueError: If strat is not a known strategy
+        """
+        if strat not in STRATEGIES:
+            raise ValueError(f"Unknown strategy {strat!r}")
+        self.strat = strat
+        self.moves = 0
+        args = [sys.executable, ENGINE_SCRIPT, strat]
+        if bitboard:
+            args += ["-e", "bitboard"]
+        self._process = subprocess.Popen(args, stdin=subprocess.PIPE,
+                                         stdout=subprocess.PIPE)
+        # answers are read straight from the pipe and split into lines
+        # here, so that select never misses a line already read into a
+        # buffer
+        self._output = self._process.stdout.fileno()
+        self._pending = b""
+        self.is_ready(timeout=30)
+
+    @property
+    def alive(self) -> bool:
+        """
+        Returns True if the engine process is still running
+        """
+        return self._process.poll() is None
+
+    def _send(self, *lines: str) -> None:
+        """
+        Sends commands to the engine, in a single write
+        """
+        self._process.stdin.write(
+            "".join(line + "\n" for line in lines).encode())
+        self._process.stdin.flush()
+
+    def _receive(self, timeout: float) -> str:
+        """
+        Reads an answer from the engine, stopping the engine if none
+        comes within timeout seconds
+
+        Raises:
+            TimeoutError: If the engine did not answer in time
+            ConnectionError: If the engine exited
+        """
+        deadline = time.monotonic() + timeout
+        while b"\n" not in self._pending:
+            remaining = deadline - time.monotonic()
+            ready, _, _ = select.select([self._output], [], [],
+                                        max(remaining, 0))
+            if not ready:
+                self._process.kill()
+                self._process.wait()
+                raise TimeoutError(f"The {self.strat} engine did not answer")
+            data = os.read(self._output, READ_SIZE)
+            if not data:
+                raise ConnectionError(f"The {self.strat} engine exited")
+            self._pending += data
+        line, self._pending = self._pending.split(b"\n", 1)
+        return line.decode().strip()
+
+    def is_ready(self, timeout: float = REPLY_MARGIN) -> None:
+        """
+        Waits until the engine has handled every command sent to it
+        """
+        self._send("isready")
+        if self._receive(timeout) != "readyok":
+            raise ConnectionError(f"The {self.strat} engine is out of step")
+
+    def best_move(self, game: ReversiBase, time_limit: float,
+                  othello: bool = True) -> Optional[Tuple[int, int]]:
+        """
+        Asks the engine for its move in the position of a game
+
+        Args:
+            game: Game whose position to search
+            time_limit: Seconds the engine may spend on the move
+            othello: Whether the game started from an Othello
+            configuration
+
+        Raises:
+            TimeoutError: If the engine went well over its budget
+            ConnectionError: If the engine exited, or answered with
+            something other than a legal move
+            ValueError: If the engine rejected the position
+
+        Returns: The engine's move, or None if the game is over
+        """
+        self.moves += 1
+        self._send(encode_position(game, othello),
+                   f"go {round(time_limit * 1000)}")
+        words = self._receive(time_limit + REPLY_MARGIN).split()
+        if words[:1] == ["error"]:
+            raise ValueError(" ".join(words[1:]))
+        if words == ["bestmove", "none"]:
+            return None
+        if len(words) != 3 or words[0] != "bestmove" or \
+                not words[1].isdigit() or not words[2].isdigit():
+            raise ConnectionError(f"The {self.strat} engine is out of step")
+        move = int(words[1]), int(words[2])
+        if max(move) >= game.size or not game.legal_move(move):
+            raise ConnectionError(f"The {self.strat} engine played an "
+                                  f"illegal move {move}")
+        return move
+
+    def close(self) -> None:
+        """
+        Stops the engine
+        """
+        if self.alive:
+            try:
+                self._send("quit")
+                self._process.wait(timeout=1)
+            except (OSError, subprocess.TimeoutExpired):
+                self._process.kill()
+                self._process.wait()
+
+
+class EnginePool:
+    """
+    Class for a pool of warm engine processes, reused from game to
+    game. Engines are taken with acquire for as long as a game lasts
+    and handed back with release; only engines in good health are kept.
+
+    Attributes:
+        bitboard (bool): whether the engines search on BitboardReversi
+        started (int): engine processes started so far
+    """
+    bitboard: bool
+    started: int
+
+    def __init__(self, bitboard: bool = False):
+        self.bitboard = bitboard
+        self.started = 0
+        self._idle: Dict[str, List[EngineProcess]] = {}
+
+    def acquire(self, strat: str) -> EngineProcess:
+        """
+        Returns an idle engine playing a strategy, starting one if
+        there is none
+        """
+        idle = self._idle.get(strat, [])
+        while idle:
+            engine = idle.pop()
+            if engine.alive:
+                return engine
+        self.started += 1
+        return EngineProcess(strat, self.bitboard)
+
+    def release(self, engine: EngineProcess) -> None:
+        """
+        Hands an engine back to the pool
+        """
+        if engine.alive:
+            self._idle.setdefault(engine.strat, []).append(engine)
+
+    def close(self) -> None:
+        """
+        Stops every idle engine
+        """
+        for engines in self._idle.values():
+            for engine in engines:
+                engine.close()
+        self._idle = {}
+
+    def __enter__(self) -> "EnginePool":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def measure_roundtrip(num_moves: int) -> Tuple[float, float]:
+    """
+    Measures how long a move request to a warm random engine takes,
+    which is almost all protocol overhead
+
+    Returns: The mean and the 99th percentile time, in seconds
+    """
+    game = Reversi(8, 2, True)
+    positions = []
+    while len(positions) < 32 and not game.done:
+        positions.append(game)
+        game = game.simulate_moves([game.available_moves[0]])
+    with EnginePool() as pool:
+        engine = pool.acquire("random")
+        times = []
+        for i in range(num_moves):
+            position = positions[i % len(positions)]
+            start = time.perf_counter()
+            engine.best_move(position, 0.0)
+            times.append(time.perf_counter() - start)
+        pool.release(engine)
+    times.sort()
+    return sum(times) / len(times), times[int(0.99 * (len(times) - 1))]
+
+
+if __name__ == "__main__":
+    if "--roundtrip" in sys.argv:
+        num_moves = 2000
+        for i, item in enumerate(sys.argv):
+            if item == "-n":
+                num_moves = int(sys.argv[i + 1])
+        mean, p99 = measure_roundtrip(num_moves)
+        print(f"Round trip over {num_moves} moves: "
+              f"mean {mean * 1e6:.0f} us, p99 {p99 * 1e6:.0f} us")
+    else:
+        engine = Reversi
+        for i, item in enumerate(sys.argv):
+            if item == "-e" and sys.argv[i + 1] == "bitboard":
+                engine = BitboardReversi
+        if len(sys.argv) < 2 or sys.argv[1] not in STRATEGIES:
+            print(f"Usage: python engine.py <{'|'.join(STRATEGIES)}> "
+                  "[-e bitboard]", file=sys.stderr)
+            sys.exit(1)
+        run_engine(sys.argv[1], engine, sys.stdin, sys.stdout)
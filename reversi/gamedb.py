@@ -0,0 +1,396 @@
+"""
+Position-indexed database of recorded Reversi games.
+
+The database is an SQLite file built from a game record file (see
+records.py) in a single streaming pass: every game is replayed, and
+each position it reaches is stored with the game's id under the
+position's canonical key (see ReversiBase.canonical_key), so that
+rotated and mirrored positions count as one. Once all the games are
+in, the positions are indexed, and the number of games reaching each
+position is tallied by outcome, so that the statistics of a position
+are a lookup of a few rows however many games reached it.
+
+Tables:
+    games (id, offset, moves, outcome, side, players, othello)
+        offset is the position of the game's record in the record
+        file, side, players and othello are the settings the game was
+        played with, and outcome is a bit mask of the winners (bit p - 1
+        for player p), or UNFINISHED if the record stops before the
+        game is over.
+    positions (key, game, ply)
+        One row for every position of every game, indexed by key.
+    outcomes (key, outcome, games)
+        Number of games reaching each position, by outcome.
+
+Keys are stored as signed 64-bit integers, as SQLite requires.
+
+Usage:
+    python gamedb.py -r record_file -o database [-e list]
+        Builds a database from a record file
+    python gamedb.py -d database [-m moves] [-g side,players,othello]
+                     [-e list] [--bench num_queries]
+        Prints the statistics of the position reached by moves (such
+        as "2,3 2,2") from the start of the games of the database (or,
+        if it holds games with several settings, of the games with
+        the given settings, such as "6,2,1"), or measures the latency
+        of random queries
+"""
+import random
+import sqlite3
+import sys
+import time
+from typing import Dict, List, Optional, Tuple, Type
+
+from reversi import Reversi, ReversiBase
+from bitboard import BitboardReversi
+from records import RECORD_HEADER, RECORDS_MAGIC, read_records
+
+
+UNFINISHED = 0
+"""
+Outcome stored for a game whose record stops before the game is over.
+"""
+
+INSERT_BATCH = 2048
+"""
+Games replayed between two inserts into the database.
+"""
+
+SCHEMA = """
+CREATE TABLE games (id INTEGER PRIMARY KEY, offset INTEGER NOT NULL,
+                    moves INTEGER NOT NULL, outcome INTEGER NOT NULL,
+                    side INTEGER NOT NULL, players INTEGER NOT NULL,
+                    othello INTEGER NOT NULL);
+CREATE TABLE positions (key INTEGER NOT NULL, game INTEGER NOT NULL,
+                        ply INTEGER NOT NULL);
+"""
+
+INDEXES = """
+CREATE INDEX positions_key ON positions (key);
+CREATE TABLE outcomes (key INTEGER NOT NULL, outcome INTEGER NOT NULL,
+                       games INTEGER NOT NULL,
+                       PRIMARY KEY (key, outcome)) WITHOUT ROWID;
+INSERT INTO outcomes
+    SELECT positions.key, games.outcome, COUNT(*)
+    FROM positions JOIN games ON games.id = positions.game
+    GROUP BY positions.key, games.outcome;
+"""
+
+
+def signed_key(key: int) -> int:
+    """
+    Returns a 64-bit key as the signed integer SQLite stores
+    """
+    return key - (1 << 64) if key >= 1 << 63 else key
+
+
+def outcome_mask(outcome: List[int]) -> int:
+    """
+    Returns the bit mask of the winners of a game, or UNFINISHED if
+    the game is not over (it has no winners yet)
+    """
+    mask = 0
+    for player in outcome:
+        mask |= 1 << (player - 1)
+    return mask
+
+
+def build_database(records_path: str, db_path: str,
+                   engine: Type[ReversiBase] = BitboardReversi) -> int:
+    """
+    Builds a database from a record file, replacing the tables of
+    any database already at db_path
+
+    Inputs:
+        records_path (str): path of the record file
+        db_path (str): path of the database
+        engine (type): engine to replay the games on
+
+    Returns:
+        The number of games stored
+
+    Raises:
+        ValueError: If the record file is malformed or holds an
+        illegal move
+    """
+    connection = sqlite3.connect(db_path)
+    try:
+        # the database is rebuilt from scratch if the build fails, so
+        # it does not need to survive a crash part way through
+        connection.execute("PRAGMA journal_mode = OFF")
+        connection.execute("PRAGMA synchronous = OFF")
+        connection.executescript("DROP TABLE IF EXISTS games;"
+                                 "DROP TABLE IF EXISTS positions;"
+                                 "DROP TABLE IF EXISTS outcomes;" + SCHEMA)
+        games = []
+        positions = []
+        game_id = 0
+        offset = len(RECORDS_MAGIC)
+        with open(records_path, "rb") as file:
+            for record in read_records(file):
+                ply = 0
+                for game in record.replay(engine):
+                    key = signed_key(game.canonical_key()[0])
+                    positions.append((key, game_id, ply))
+                    ply += 1
+                games.append((game_id, offset, len(record.squares),
+                              outcome_mask(game.outcome), record.side,
+                              record.players, int(record.othello)))
+                game_id += 1
+                offset += RECORD_HEADER.size + len(record.squares)
+                if len(games) >= INSERT_BATCH:
+                    _insert(connection, games, positions)
+        _insert(connection, games, positions)
+        connection.executescript(INDEXES)
+        connection.commit()
+    finally:
+        connection.close()
+    return game_id
+
+
+def _insert(connection: sqlite3.Connection, games: List[tuple],
+            positions: List[tuple]) -> None:
+    """
+    Inserts a batch of games and their positions, emptying the lists
+    """
+    connection.executemany("INSERT INTO games VALUES (?, ?, ?, ?, ?, ?, ?)",
+                           games)
+    connection.executemany("INSERT INTO positions VALUES (?, ?, ?)",
+                           positions)
+    games.clear()
+    positions.clear()
+
+
+class PositionStats:
+    """
+    Class to represent how the games reaching a position ended.
+
+    Attributes:
+        games (int): number of finished games that reached the
+            position
+        wins (dict): games won outright by each player
+        ties (int): games that ended in a tie
+        unfinished (int): games that reached the position but whose
+            records stop before the end; they are not counted in games
+    """
+    games: int
+    wins: Dict[int, int]
+    ties: int
+    unfinished: int
+
+    def __init__(self, games: int, wins: Dict[int, int], ties: int,
+                 unfinished: int = 0):
+        self.games = games
+        self.wins = wins
+        self.ties = ties
+        self.unfinished = unfinished
+
+    def win_rate(self, player: int) -> float:
+        """
+        Returns the fraction of the finished games won outright by a
+        player
+        """
+        return self.wins.get(player, 0) / self.games if self.games else 0.0
+
+
+class GameDatabase:
+    """
+    Class to represent a game database opened for queries.
+    """
+
+    def __init__(self, path: str):
+        """
+        Constructor
+
+        Args:
+            path: Path of the database
+
+        Raises:
+            ValueError: If the file is not a game database, or was
+            built before games recorded their settings
+        """
+        self._connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            self._connection.execute("SELECT 1 FROM outcomes LIMIT 1")
+        except sqlite3.DatabaseError:
+            self._connection.close()
+            raise ValueError("The file is not a game database") from None
+        try:
+            self._connection.execute("SELECT side FROM games LIMIT 1")
+        except sqlite3.DatabaseError:
+            self._connection.close()
+            raise ValueError("The game database was built without the "
+                             "settings of its games, rebuild it") from None
+
+    def close(self) -> None:
+        """
+        Closes the database
+        """
+        self._connection.close()
+
+    @property
+    def num_games(self) -> int:
+        """
+        Returns the number of games in the database
+        """
+        return self._connection.execute(
+            "SELECT COUNT(*) FROM games").fetchone()[0]
+
+    def settings(self) -> List[Tuple[int, int, bool]]:
+        """
+        Returns the side, number of players and Othello flag of every
+        kind of game in the database
+        """
+        rows = self._connection.execute(
+            "SELECT DISTINCT side, players, othello FROM games "
+            "ORDER BY side, players, othello")
+        return [(side, players, bool(othello))
+                for side, players, othello in rows]
+
+    def stats_for_key(self, key: int) -> PositionStats:
+        """
+        Returns how the games reaching the position with a given
+        canonical key ended
+        """
+        rows = self._connection.execute(
+            "SELECT outcome, games FROM outcomes WHERE key = ?",
+            (signed_key(key),)).fetchall()
+        games = 0
+        ties = 0
+        unfinished = 0
+        wins = {}
+        for outcome, count in rows:
+            if outcome == UNFINISHED:
+                unfinished += count
+                continue
+            games += count
+            if outcome & (outcome - 1):
+                ties += count
+            else:
+                player = outcome.bit_length()
+                wins[player] = wins.get(player, 0) + count
+        return PositionStats(games, wins, ties, unfinished)
+
+    def stats(self, game: ReversiBase) -> PositionStats:
+        """
+        Returns how the games reaching the position of a game (or a
+        rotation or reflection of it) ended
+        """
+        return self.stats_for_key(game.canonical_key()[0])
+
+    def game_ids(self, game: ReversiBase,
+                 limit: Optional[int] = None) -> List[int]:
+        """
+        Returns the ids of the games reaching the position of a game
+        (or a rotation or reflection of it), at most limit of them
+        """
+        rows = self._connection.execute(
+            "SELECT game FROM positions WHERE key = ? ORDER BY game "
+            "LIMIT ?", (signed_key(game.canonical_key()[0]),
+                        -1 if limit is None else limit))
+        return [row[0] for row in rows]
+
+    def record_offset(self, game_id: int) -> Optional[int]:
+        """
+        Returns the position of a game's record in the record file
+        the database was built from, or None if there is no such game
+        """
+        row = self._connection.execute(
+            "SELECT offset FROM games WHERE id = ?", (game_id,)).fetchone()
+        return None if row is None else row[0]
+
+    def random_keys(self, count: int, rng: random.Random) -> List[int]:
+        """
+        Returns the keys of count positions drawn at random from the
+        stored positions
+        """
+        total = self._connection.execute(
+            "SELECT MAX(rowid) FROM positions").fetchone()[0] or 0
+        keys = []
+        for _ in range(count if total else 0):
+            row = self._connection.execute(
+                "SELECT key FROM positions WHERE rowid = ?",
+                (rng.randint(1, total),)).fetchone()
+            keys.append(row[0] % (1 << 64))
+        return keys
+
+
+if __name__ == "__main__":
+    records_path = None
+    db_path = "games.db"
+    engine = BitboardReversi
+    moves = None
+    game_settings = None
+    num_queries = 0
+
+    for i, item in enumerate(sys.argv):
+        if item == "-r":
+            records_path = sys.argv[i + 1]
+        if item == "-o" or item == "-d":
+            db_path = sys.argv[i + 1]
+        if item == "-e" and sys.argv[i + 1] == "list":
+            engine = Reversi
+        if item == "-m":
+            moves = [tuple(int(value) for value in move.split(","))
+                     for move in sys.argv[i + 1].split()]
+        if item == "-g":
+            side, players, othello = (int(value)
+                                      for value in sys.argv[i + 1].split(","))
+            game_settings = (side, players, othello == 1)
+        if item == "--bench":
+            num_queries = int(sys.argv[i + 1])
+
+    if records_path is not None:
+        start = time.perf_counter()
+        count = build_database(records_path, db_path, engine)
+        print(f"Stored {count} games in {db_path} "
+              f"in {time.perf_counter() - start:.1f} s")
+        sys.exit(0)
+
+    database = GameDatabase(db_path)
+    if moves is not None:
+        if game_settings is None:
+            choices = database.settings()
+            if not choices:
+                print("The database holds no games", file=sys.stderr)
+                sys.exit(1)
+            if len(choices) > 1:
+                print("The database holds games with several settings, "
+                      "choose one with -g: " + ", ".join(
+                          f"{side},{players},{int(othello)}"
+                          for side, players, othello in choices),
+                      file=sys.stderr)
+                sys.exit(1)
+            game_settings = choices[0]
+        try:
+            game = engine(*game_settings)
+        except ValueError as error:
+            print(error, file=sys.stderr)
+            sys.exit(1)
+        for move in moves:
+            if game.done or not game.legal_move(move):
+                print(f"Illegal move {move}", file=sys.stderr)
+                sys.exit(1)
+            game.apply_move(move)
+        start = time.perf_counter()
+        stats = database.stats(game)
+        seconds = time.perf_counter() - start
+        print(f"{stats.games + stats.unfinished} of {database.num_games} "
+              f"games reached the position ({seconds * 1000:.2f} ms)")
+        for player in range(1, game.num_players + 1):
+            print(f"Player {player} wins: {stats.win_rate(player):.1%}")
+        print(f"Ties: {stats.ties / stats.games if stats.games else 0:.1%}")
+        if stats.unfinished:
+            print(f"Unfinished games (not counted): {stats.unfinished}")
+    if num_queries > 0 and database.num_games > 0:
+        keys = database.random_keys(num_queries, random.Random(0))
+        times = []
+        for key in keys:
+            start = time.perf_counter()
+            database.stats_for_key(key)
+            times.append(time.perf_counter() - start)
+        times.sort()
+        print(f"{len(times)} queries: mean "
+              f"{sum(times) / len(times) * 1000:.3f} ms, p99 "
+              f"{times[int(0.99 * (len(times) - 1))] * 1000:.3f} ms")
+    database.close()
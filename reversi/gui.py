@@ -7,7 +7,8 @@ import pygame  # pylint: disable=wrong-import-position
 from pygame import mixer
 from mocks import ReversiStub
 from mocks import ReversiMock
-from reversi import Reversi
+from reversi import Reversi, ReversiBase
+from bitboard import BitboardReversi
 import click
 
 
@@ -23,7 +24,7 @@ class ReversiGUI:
     
 
     def __init__(self, window: int , side_len: int,
-                 reversi: Reversi):
+                 reversi: ReversiBase):
         """
         Constructor
 
@@ -75,6 +76,7 @@ class ReversiGUI:
         """
         side = self.side
         available_moves = self.mock_instance.available_moves
+        grid = self.mock_instance.grid
         
         
         # Background
@@ -91,23 +93,23 @@ class ReversiGUI:
                 xcenter = (x1 + x2) / 2
                 ycenter = (y1 + y2) / 2
                 
-                if self.mock_instance._grid._board[row][col] == 2:
+                if grid[row][col] == 2:
                     pygame.draw.circle(self.surface, (1, 50, 32), (xcenter, ycenter), spacing/2.5)
-                if self.mock_instance._grid._board[row][col] == 1:
+                if grid[row][col] == 1:
                     pygame.draw.circle(self.surface, (250, 128, 114), (xcenter, ycenter), spacing/2.5)
-                if self.mock_instance._grid._board[row][col] == 3:
+                if grid[row][col] == 3:
                     pygame.draw.circle(self.surface, (0, 255, 255), (xcenter, ycenter), spacing/2.5)
-                if self.mock_instance._grid._board[row][col] == 4:
+                if grid[row][col] == 4:
                     pygame.draw.circle(self.surface, (102, 102, 255), (xcenter, ycenter), spacing/2.5)
-                if self.mock_instance._grid._board[row][col] == 5:
+                if grid[row][col] == 5:
                     pygame.draw.circle(self.surface, (255, 255, 0), (xcenter, ycenter), spacing/2.5)
-                if self.mock_instance._grid._board[row][col] == 6:
+                if grid[row][col] == 6:
                     pygame.draw.circle(self.surface, (255, 0, 0), (xcenter, ycenter), spacing/2.5)
-                if self.mock_instance._grid._board[row][col] == 7:
+                if grid[row][col] == 7:
                     pygame.draw.circle(self.surface, (51, 255, 255), (xcenter, ycenter), spacing/2.5)
-                if self.mock_instance._grid._board[row][col] == 8:
+                if grid[row][col] == 8:
                     pygame.draw.circle(self.surface, (153, 0, 153), (xcenter, ycenter), spacing/2.5)
-                if self.mock_instance._grid._board[row][col] == 9:
+                if grid[row][col] == 9:
                     pygame.draw.circle(self.surface, (0, 102, 0), (xcenter, ycenter), spacing/2.5)
         ##working on highlighting availiable moves
         for move in available_moves:
@@ -136,23 +138,23 @@ class ReversiGUI:
                 sub_surface.blit(text_surface, (10, 10))
                 self.surface.blit(sub_surface,(200, 200))
         ## working on player indication
-        if self.mock_instance._turn == 1:
+        if self.mock_instance.turn == 1:
             pygame.draw.circle(self.surface, (250, 128, 114), (650, 300), 30 )
-        elif self.mock_instance._turn == 2:
+        elif self.mock_instance.turn == 2:
             pygame.draw.circle(self.surface,(1, 50, 32), (650, 300), 30 )
-        elif self.mock_instance._turn == 3:
+        elif self.mock_instance.turn == 3:
             pygame.draw.circle(self.surface,(0, 255, 255), (650, 300), 30 )
-        elif self.mock_instance._turn == 4:
+        elif self.mock_instance.turn == 4:
             pygame.draw.circle(self.surface,(102, 102, 255), (650, 300), 30 )
-        elif self.mock_instance._turn == 5:
+        elif self.mock_instance.turn == 5:
             pygame.draw.circle(self.surface,(255, 255, 0), (650, 300), 30 )
-        elif self.mock_instance._turn == 6:
+        elif self.mock_instance.turn == 6:
             pygame.draw.circle(self.surface,(255, 0, 0), (650, 300), 30 )
-        elif self.mock_instance._turn == 7:
+        elif self.mock_instance.turn == 7:
             pygame.draw.circle(self.surface,(51, 255, 255), (650, 300), 30 )
-        elif self.mock_instance._turn == 8:
+        elif self.mock_instance.turn == 8:
             pygame.draw.circle(self.surface,(153, 0, 153), (650, 300), 30 )
-        elif self.mock_instance._turn == 9:
+        elif self.mock_instance.turn == 9:
             pygame.draw.circle(self.surface,(0, 102, 0), (650, 300), 30 )
         
 
@@ -212,11 +214,13 @@ class ReversiGUI:
 @click.option('-n', '--num-players', type=int, default=2, help='Number of players')
 @click.option('-s', '--board-size', type=int, default=8, help='Board size')
 @click.option('--othello/--non-othello', default=True, help='Game mode')
-def play_game(num_players, board_size, othello):
+@click.option('--bitboard/--lists', default=False, help='Game engine')
+def play_game(num_players, board_size, othello, bitboard):
     # Check for valid combinations of parameters
     if (num_players % 2 == 1 and board_size % 2 == 0) or (num_players % 2 == 0 and board_size % 2 == 1):
         print('Invalid combination of players and board size.')
-    reversi = ReversiGUI(window = 600, side_len = 100, reversi = Reversi(board_size, num_players, othello))
+    engine = BitboardReversi if bitboard else Reversi
+    reversi = ReversiGUI(window = 600, side_len = 100, reversi = engine(board_size, num_players, othello))
 
     
     
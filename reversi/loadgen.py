@@ -0,0 +1,181 @@
+"""
+Load generator for the Reversi game server.
+
+Opens many connections to a server at once, and on each one plays
+games against a server bot, choosing random legal moves for the
+client's player. Every move request is timed from sending it to
+reading the reply (which includes the bot's answer), and the run is
+summarized as moves per second and latency percentiles.
+
+With -l, a server is started on the given port for the run and
+stopped afterwards.
+
+Usage:
+    python loadgen.py [-H host] [-p port] [-c connections]
+                      [-g games_per_connection] [-b bot_strategy]
+                      [-l] [-w server_workers] [-s seed]
+"""
+import asyncio
+import json
+import os
+import random
+import signal
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """
+    Returns the value below which a given fraction of a sorted
+    list of values lie (nearest rank)
+    """
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(fraction * len(values)))
+    return values[index]
+
+
+async def request(reader: asyncio.StreamReader,
+                  writer: asyncio.StreamWriter,
+                  message: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Sends one request to the server and returns its reply
+
+    Raises:
+        ConnectionError: If the server closed the connection
+    """
+    writer.write(json.dumps(message).encode() + b"\n")
+    await writer.drain()
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("The server closed the connection")
+    return json.loads(line)
+
+
+async def client(host: str, port: int, num_games: int, bot: str,
+                 seed: int, latencies: List[float]) -> int:
+    """
+    Plays num_games games on one connection, as player 1 against the
+    server's bot, appending the latency of every move request
+
+    Returns: The number of requests the server answered with an error
+    """
+    rng = random.Random(seed)
+    errors = 0
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for _ in range(num_games):
+            state = await request(reader, writer,
+                                  {"op": "new", "bots": {"2": bot}})
+            if not state["ok"]:
+                errors += 1
+                continue
+            game_id = state["game"]
+            while state["ok"] and not state["done"]:
+                move = rng.choice(state["moves"])
+                start = time.perf_counter()
+                state = await request(reader, writer, {
+                    "op": "move", "game": game_id, "move": move})
+                latencies.append(time.perf_counter() - start)
+                if not state["ok"]:
+                    errors += 1
+            await request(reader, writer, {"op": "close", "game": game_id})
+    finally:
+        writer.close()
+    return errors
+
+
+async def wait_for_server(host: str, port: int, timeout: float) -> None:
+    """
+    Waits until a server accepts connections
+
+    Raises:
+        TimeoutError: If it does not within timeout seconds
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+            writer.close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise TimeoutError("The server did not start") from None
+            await asyncio.sleep(0.1)
+
+
+async def run(host: str, port: int, connections: int, num_games: int,
+              bot: str, local: bool, workers: Optional[int],
+              seed: int) -> None:
+    """
+    Runs the load test and prints its results
+    """
+    process = None
+    if local:
+        args = [sys.executable,
+                os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             "server.py"),
+                "-H", host, "-p", str(port)]
+        if workers is not None:
+            args += ["-w", str(workers)]
+        process = await asyncio.create_subprocess_exec(
+            *args, stdout=asyncio.subprocess.DEVNULL)
+        await wait_for_server(host, port, 10)
+
+    try:
+        latencies = []
+        start = time.perf_counter()
+        errors = await asyncio.gather(*(
+            client(host, port, num_games, bot, seed + i, latencies)
+            for i in range(connections)))
+        seconds = time.perf_counter() - start
+    finally:
+        if process is not None:
+            # interrupted rather than terminated, so that the server
+            # shuts its bot workers down too
+            process.send_signal(signal.SIGINT)
+            await process.wait()
+
+    latencies.sort()
+    print(f"{connections} connections, {connections * num_games} games "
+          f"against {bot} bots")
+    print(f"{len(latencies)} moves in {seconds:.2f} s: "
+          f"{len(latencies) / seconds:.0f} moves/s")
+    print(f"Latency: p50 {percentile(latencies, 0.5) * 1000:.2f} ms, "
+          f"p99 {percentile(latencies, 0.99) * 1000:.2f} ms, "
+          f"max {latencies[-1] * 1000 if latencies else 0.0:.2f} ms")
+    if sum(errors):
+        print(f"{sum(errors)} requests failed")
+
+
+if __name__ == "__main__":
+    host = "127.0.0.1"
+    port = 7878
+    connections = 100
+    num_games = 4
+    bot = "random"
+    local = False
+    workers = None
+    seed = 0
+
+    for i, item in enumerate(sys.argv):
+        if item == "-H":
+            host = sys.argv[i + 1]
+        if item == "-p":
+            port = int(sys.argv[i + 1])
+        if item == "-c":
+            connections = int(sys.argv[i + 1])
+        if item == "-g":
+            num_games = int(sys.argv[i + 1])
+        if item == "-b":
+            bot = sys.argv[i + 1]
+        if item == "-l":
+            local = True
+        if item == "-w":
+            workers = int(sys.argv[i + 1])
+        if item == "-s":
+            seed = int(sys.argv[i + 1])
+
+    asyncio.run(run(host, port, connections, num_games, bot, local,
+                    workers, seed))
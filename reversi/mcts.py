@@ -0,0 +1,201 @@
+"""
+Monte Carlo Tree Search (UCT) for Reversi.
+
+Every playout walks down the tree and then plays random moves to the
+end of the game on the game being searched, using push_move/pop_move,
+so no game is ever copied. The tree is stored in flat arrays indexed
+by node number, and the children of a node are created together so
+that they occupy a contiguous range of node numbers.
+
+Works for any number of players: each node records the player who
+made the move leading to it, and is scored by how often that player
+went on to win (ties share the win).
+"""
+from array import array
+import math
+import random
+import time
+from typing import List, Optional, Tuple
+
+from reversi import ReversiBase
+
+
+class MCTS:
+    """
+    Class for a UCT searcher.
+
+    Attributes:
+        playouts (int): playouts per search, or None for no limit
+        time_limit (float): seconds per search, or None for no limit
+        exploration (float): UCT exploration constant
+        total_playouts (int): playouts over all searches
+        total_seconds (float): time taken by all searches
+    """
+    playouts: Optional[int]
+    time_limit: Optional[float]
+    exploration: float
+    total_playouts: int
+    total_seconds: float
+
+    def __init__(self, playouts: Optional[int] = 1000,
+                 time_limit: Optional[float] = None,
+                 exploration: float = 1.4,
+                 rng: Optional[random.Random] = None):
+        """
+        Constructor
+
+        Args:
+            playouts: Playouts per search, or None for no limit
+            time_limit: Seconds per search, or None for no limit
+            exploration: UCT exploration constant
+            rng: Random number generator for the playouts
+
+        Raises:
+            ValueError: If there is neither a playout nor a time limit
+        """
+        if playouts is None and time_limit is None:
+            raise ValueError("MCTS needs a playout or a time limit")
+        self.playouts = playouts
+        self.time_limit = time_limit
+        self.exploration = exploration
+        self.total_playouts = 0
+        self.total_seconds = 0.0
+        self._rng = rng if rng is not None else random.Random()
+
+    @property
+    def playouts_per_second(self) -> float:
+        """
+        Returns the number of playouts per second over all searches
+        """
+        if self.total_seconds <= 0:
+            return 0.0
+        return self.total_playouts / self.total_seconds
+
+    def _reset_tree(self) -> None:
+        """
+        Creates a tree holding only the root
+        """
+        self._parent = array("i", [-1])
+        self._move = array("h", [-1])
+        self._player = array("b", [0])
+        self._visits = array("i", [0])
+        self._wins = array("d", [0.0])
+        self._first_child = array("i", [-1])
+        self._num_children = array("h", [0])
+
+    def _expand(self, node: int, game: ReversiBase) -> None:
+        """
+        Creates the children of a node, one per available move
+        """
+        moves = game.available_moves
+        self._first_child[node] = len(self._parent)
+        self._num_children[node] = len(moves)
+        player = game.turn
+        for row, col in moves:
+            self._parent.append(node)
+            self._move.append(row << 8 | col)
+            self._player.append(player)
+            self._visits.append(0)
+            self._wins.append(0.0)
+            self._first_child.append(-1)
+            self._num_children.append(0)
+
+    def _select(self, node: int) -> int:
+        """
+        Returns the child of a node with the highest UCT value,
+        or its first unvisited child
+        """
+        first = self._first_child[node]
+        log_visits = math.log(self._visits[node] or 1)
+        best = first
+        best_value = -1.0
+        for child in range(first, first + self._num_children[node]):
+            visits = self._visits[child]
+            if visits == 0:
+                return child
+            value = (self._wins[child] / visits + self.exploration
+                     * math.sqrt(log_visits / visits))
+            if value > best_value:
+                best = child
+                best_value = value
+        return best
+
+    def _push(self, game: ReversiBase, node: int) -> None:
+        """
+        Plays the move leading to a node
+        """
+        move = self._move[node]
+        game.push_move((move >> 8, move & 0xFF))
+
+    def search(self, game: ReversiBase) -> Tuple[int, int]:
+        """
+        Finds the best move for the player whose turn it is.
+
+        The game is modified during the search, but is restored
+        to its original state before returning.
+
+        Args:
+            game: Game to search. Must not be over.
+
+        Returns: The most visited move at the root.
+        """
+        start = time.perf_counter()
+        deadline = None
+        if self.time_limit is not None:
+            deadline = start + self.time_limit
+        self._reset_tree()
+        self._expand(0, game)
+        rng = self._rng
+
+        playouts = 0
+        while self.playouts is None or playouts < self.playouts:
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            pushed = 0
+            node = 0
+            try:
+                # selection
+                while self._num_children[node] > 0:
+                    node = self._select(node)
+                    self._push(game, node)
+                    pushed += 1
+                # expansion
+                if not game.done and self._visits[node] > 0:
+                    self._expand(node, game)
+                    node = self._select(node)
+                    self._push(game, node)
+                    pushed += 1
+                # playout
+                while not game.done:
+                    game.push_move(rng.choice(game.available_moves))
+                    pushed += 1
+                winners = game.outcome
+            finally:
+                for _ in range(pushed):
+                    game.pop_move()
+            # backpropagation
+            share = 1.0 / len(winners)
+            while node >= 0:
+                self._visits[node] += 1
+                if self._player[node] in winners:
+                    self._wins[node] += share
+                node = self._parent[node]
+            playouts += 1
+
+        first = self._first_child[0]
+        children = range(first, first + self._num_children[0])
+        best = max(children, key=lambda child: self._visits[child])
+        self.total_playouts += playouts
+        self.total_seconds += time.perf_counter() - start
+        move = self._move[best]
+        return move >> 8, move & 0xFF
+
+    def root_visits(self) -> List[Tuple[Tuple[int, int], int]]:
+        """
+        Returns the moves at the root of the last search, with the
+        number of playouts that went through each of them
+        """
+        first = self._first_child[0]
+        return [((self._move[child] >> 8, self._move[child] & 0xFF),
+                 self._visits[child])
+                for child in range(first, first + self._num_children[0])]
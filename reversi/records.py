@@ -0,0 +1,289 @@
+"""
+Compact binary records of finished Reversi games.
+
+A record file starts with the four bytes RECORDS_MAGIC, followed by
+one record per game. Each record is framed on its own, so games can be
+appended to a file at any time and read back one at a time:
+
+    byte 0      board side
+    byte 1      number of players (low 7 bits), and whether the game
+                started from an Othello configuration (high bit)
+    bytes 2-3   number of moves, little-endian
+    bytes 4-    one byte per move: the square, row * side + col
+
+Passes are not stored, since the player to move always follows from
+the position. An 8x8 game takes about 64 bytes, so ten million games
+fit in about 640 MB.
+
+Run as a script, prints a summary of a record file, replaying every
+game to check it.
+
+Usage:
+    python records.py <record_file> [-e bitboard]
+"""
+import struct
+import sys
+from typing import BinaryIO, Iterator, List, Tuple, Type
+
+from reversi import MAX_PLAYERS, ListMovesType, Reversi, ReversiBase
+from bitboard import BitboardReversi
+
+
+RECORDS_MAGIC = b"RVGR"
+"""
+First bytes of every record file.
+"""
+
+RECORD_HEADER = struct.Struct("<BBH")
+"""
+Layout of the header of a record: side, players and Othello flag,
+number of moves.
+"""
+
+OTHELLO_FLAG = 0x80
+"""
+Bit of the players byte set for games started from an Othello
+configuration.
+"""
+
+READ_BUFFER = 1 << 20
+"""
+Bytes read from a record file at a time.
+"""
+
+
+class GameRecord:
+    """
+    Class to represent the record of one game.
+
+    Attributes:
+        side (int): number of squares on each side of the board
+        players (int): number of players
+        othello (bool): whether the game started from an Othello
+            configuration
+        squares (bytes): square (row * side + col) of every move
+    """
+    side: int
+    players: int
+    othello: bool
+    squares: bytes
+
+    def __init__(self, side: int, players: int, othello: bool,
+                 squares: bytes):
+        """
+        Constructor
+
+        Args:
+            side: Number of squares on each side of the board
+            players: Number of players
+            othello: Whether the game started from an Othello
+            configuration
+            squares: Square of every move
+
+        Raises:
+            ValueError: If the board is too large to be recorded
+        """
+        if side * side > 256 or not 1 <= players < OTHELLO_FLAG:
+            raise ValueError("The game is too large to be recorded")
+        self.side = side
+        self.players = players
+        self.othello = othello
+        self.squares = squares
+
+    @classmethod
+    def from_moves(cls, side: int, players: int, othello: bool,
+                   moves: ListMovesType) -> "GameRecord":
+        """
+        Builds the record of a game from its (row, col) moves
+        """
+        return cls(side, players, othello,
+                   bytes(row * side + col for row, col in moves))
+
+    @property
+    def moves(self) -> ListMovesType:
+        """
+        Returns the (row, col) position of every move
+        """
+        return [divmod(square, self.side) for square in self.squares]
+
+    def encode(self) -> bytes:
+        """
+        Returns the record in its binary form
+        """
+        flags = self.players | (OTHELLO_FLAG if self.othello else 0)
+        return RECORD_HEADER.pack(self.side, flags,
+                                  len(self.squares)) + self.squares
+
+    def replay(self, engine: Type[ReversiBase] = Reversi
+               ) -> Iterator[ReversiBase]:
+        """
+        Replays the game lazily, yielding the game in its starting
+        position and again after each move. The same game object is
+        yielded every time, so it must be copied to be kept.
+
+        Args:
+            engine: Engine to replay the game on
+
+        Raises:
+            ValueError: If a move of the record is not legal
+        """
+        game = engine(self.side, self.players, self.othello)
+        yield game
+        for row, col in self.moves:
+            if game.done or not game.legal_move((row, col)):
+                raise ValueError(f"Illegal move {(row, col)} in record")
+            game.apply_move((row, col))
+            yield game
+
+    def play(self, engine: Type[ReversiBase] = Reversi) -> ReversiBase:
+        """
+        Replays the game to its end and returns it
+        """
+        for game in self.replay(engine):
+            pass
+        return game
+
+
+class RecordWriter:
+    """
+    Class to append game records to a file. The magic is written
+    when the file is new or empty.
+
+    Attributes:
+        games (int): games written through this writer
+    """
+    games: int
+
+    def __init__(self, path: str):
+        """
+        Constructor
+
+        Args:
+            path: Path of the record file
+
+        Raises:
+            ValueError: If the file exists and is not a record file
+        """
+        self._file = open(path, "ab")
+        self.games = 0
+        if self._file.tell() == 0:
+            self._file.write(RECORDS_MAGIC)
+        else:
+            with open(path, "rb") as file:
+                if file.read(len(RECORDS_MAGIC)) != RECORDS_MAGIC:
+                    self._file.close()
+                    raise ValueError("The file is not a game record file")
+
+    def write(self, record: GameRecord) -> None:
+        """
+        Appends a record to the file
+        """
+        self._file.write(record.encode())
+        self.games += 1
+
+    def write_encoded(self, records: List[bytes]) -> None:
+        """
+        Appends records already in their binary form
+        """
+        self._file.write(b"".join(records))
+        self.games += len(records)
+
+    def close(self) -> None:
+        """
+        Closes the file
+        """
+        self._file.close()
+
+    def __enter__(self) -> "RecordWriter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def read_records(file: BinaryIO) -> Iterator[GameRecord]:
+    """
+    Reads the records of a file lazily, a buffer at a time
+
+    Inputs:
+        file (file): record file opened for reading in binary mode
+
+    Returns:
+        An iterator over the records
+
+    Raises:
+        ValueError: If the file is not a record file, or ends in the
+        middle of a record
+    """
+    if file.read(len(RECORDS_MAGIC)) != RECORDS_MAGIC:
+        raise ValueError("The file is not a game record file")
+    buffer = b""
+    offset = 0
+    header_size = RECORD_HEADER.size
+    while True:
+        if len(buffer) - offset < header_size:
+            buffer = buffer[offset:] + file.read(READ_BUFFER)
+            offset = 0
+            if not buffer:
+                return
+            if len(buffer) < header_size:
+                raise ValueError("The file ends in the middle of a record")
+        side, flags, count = RECORD_HEADER.unpack_from(buffer, offset)
+        end = offset + header_size + count
+        if end > len(buffer):
+            buffer = buffer[offset:] + file.read(max(READ_BUFFER, end))
+            offset = 0
+            end = header_size + count
+            if end > len(buffer):
+                raise ValueError("The file ends in the middle of a record")
+        yield GameRecord(side, flags & ~OTHELLO_FLAG,
+                         bool(flags & OTHELLO_FLAG),
+                         buffer[offset + header_size:end])
+        offset = end
+
+
+def summarize(path: str, engine: Type[ReversiBase]
+              ) -> Tuple[int, int, List[int], int]:
+    """
+    Replays every game of a record file
+
+    Returns: The number of games and moves, the number of wins of
+    each player (index 0 counts ties), and the number of records that
+    stop before their game is over (these are not counted as wins or
+    ties)
+    """
+    games = 0
+    moves = 0
+    wins = [0] * (MAX_PLAYERS + 1)
+    unfinished = 0
+    with open(path, "rb") as file:
+        for record in read_records(file):
+            game = record.play(engine)
+            games += 1
+            moves += len(record.squares)
+            if not game.done:
+                unfinished += 1
+                continue
+            outcome = game.outcome
+            wins[outcome[0] if len(outcome) == 1 else 0] += 1
+    return games, moves, wins, unfinished
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python records.py <record_file> [-e bitboard]",
+              file=sys.stderr)
+        sys.exit(1)
+    engine = Reversi
+    for i, item in enumerate(sys.argv):
+        if item == "-e" and sys.argv[i + 1] == "bitboard":
+            engine = BitboardReversi
+
+    games, moves, wins, unfinished = summarize(sys.argv[1], engine)
+    print(f"{games} games, {moves} moves")
+    for player, count in enumerate(wins):
+        if player > 0 and count > 0:
+            print(f"Player {player} wins: {count}")
+    print(f"Ties: {wins[0]}")
+    if unfinished:
+        print(f"Unfinished games: {unfinished}")
@@ -5,10 +5,15 @@ Contains a base class (ReversiBase). You must implement
 a Reversi class that inherits from this base class.
 """
 from abc import ABC, abstractmethod
-from copy import deepcopy
-import operator
-from typing import Dict, List, Tuple, Optional
+from array import array
+from copy import copy
+from functools import lru_cache
+import random
+from typing import (TYPE_CHECKING, Dict, List, Optional, Sequence, Set,
+                    Tuple)
 
+if TYPE_CHECKING:
+    import numpy as np
 
 
 BoardGridType = List[List[Optional[int]]]
@@ -25,10 +30,245 @@ ListMovesType = List[Tuple[int, int]]
 Type for representing lists of moves on the board.
 """
 
+UndoType = Tuple[Optional[int], List[Tuple[int, int]], int]
+"""
+Type for an entry of the undo stack: the board cell the piece was
+placed on (or None if no piece was placed), the flipped cells with
+their previous owners, and the turn before the move.
+"""
+
+MAX_PLAYERS = 9
+"""
+Largest number of players that the hash keys support.
+"""
+
+
+@lru_cache(maxsize=None)
+def zobrist_keys(side: int) -> Tuple[List[List[int]], List[int]]:
+    """
+    Generates the Zobrist keys for a board of a given side. The keys
+    are drawn from a generator seeded with the side, so a position
+    hashes to the same value in every process.
+
+    Inputs:
+        side (int): number of squares on each side of the board
+
+    Returns:
+        A 64-bit key for every (square, player) pair, indexed by
+        row * side + col and then by player (the key for player 0,
+        an empty square, is 0), and a 64-bit key for every player
+        whose turn it is
+    """
+    rng = random.Random(side)
+    square_keys = [[0] + [rng.getrandbits(64) for _ in range(MAX_PLAYERS)]
+                   for _ in range(side * side)]
+    turn_keys = [0] + [rng.getrandbits(64) for _ in range(MAX_PLAYERS)]
+    return square_keys, turn_keys
+
+
+BORDER = 0xFF
+"""
+Value of the sentinel cells that surround the squares of a Board.
+"""
+
+
+@lru_cache(maxsize=None)
+def mailbox_layout(side: int) -> Tuple[int, Tuple[int, ...],
+                                       List[Optional[Tuple[int, int]]]]:
+    """
+    Describes the mailbox used by Board for a given side: the squares
+    are laid out row by row in a 1-D array, with a one-cell border of
+    BORDER cells all around, so that a walk along a ray stops at the
+    edge of the board without any bounds checks. Square (row, col) is
+    cell (row + 1) * width + col + 1.
+
+    Inputs:
+        side (int): number of squares on each side of the board
+
+    Returns:
+        The width of a row of cells (side + 2), the step between cells
+        in each direction of direction_list, and the (row, column)
+        position of every cell (None for the border).
+    """
+    width = side + 2
+    offsets = tuple(d_row * width + d_col for d_row, d_col in direction_list)
+    positions = [None] * (width * width)
+    for row in range(side):
+        for col in range(side):
+            positions[(row + 1) * width + col + 1] = (row, col)
+    return width, offsets, positions
+
+
+@lru_cache(maxsize=None)
+def mailbox_keys(side: int) -> List[Optional[List[int]]]:
+    """
+    Returns the Zobrist keys of zobrist_keys(side) indexed by mailbox
+    cell instead of by row * side + col (None for the border)
+    """
+    square_keys = zobrist_keys(side)[0]
+    return [None if pos is None else square_keys[pos[0] * side + pos[1]]
+            for pos in mailbox_layout(side)[2]]
+
+
+SYMMETRIES = 8
+"""
+Number of symmetries of a square board: the identity, three rotations
+and four reflections.
+"""
+
+
+def transform_position(pos: Tuple[int, int], transform: int,
+                       side: int) -> Tuple[int, int]:
+    """
+    Maps a position through one of the symmetries of the board
+
+    Inputs:
+        pos (tuple): (row, column) position
+        transform (int): symmetry, from 0 to SYMMETRIES - 1: identity,
+            rotation by 90, 180 and 270 degrees clockwise, mirror
+            left-right, mirror top-bottom, transpose, anti-transpose
+        side (int): number of squares on each side of the board
+
+    Returns:
+        The position the square is mapped to
+    """
+    row, col = pos
+    last = side - 1
+    return [(row, col), (col, last - row), (last - row, last - col),
+            (last - col, row), (row, last - col), (last - row, col),
+            (col, row), (last - col, last - row)][transform]
+
+
+def inverse_transform(transform: int) -> int:
+    """
+    Returns the symmetry that undoes a given one (only the rotations
+    by 90 and 270 degrees are not their own inverse)
+    """
+    return {1: 3, 3: 1}.get(transform, transform)
+
+
+@lru_cache(maxsize=None)
+def symmetry_tables(side: int) -> List[List[int]]:
+    """
+    Returns, for every symmetry, the square (row * side + col) that
+    each square is mapped to
+    """
+    return [[row * side + col
+             for row, col in (transform_position((r, c), transform, side)
+                              for r in range(side) for c in range(side))]
+            for transform in range(SYMMETRIES)]
+
+
+def canonical_masks(candidates: List[Tuple[int, ...]], turn: int,
+                    side: int) -> Tuple[int, int]:
+    """
+    Picks the canonical form of a position among its symmetric images
+    and hashes it.
+
+    Inputs:
+        candidates (list): for every symmetry, the image of the position
+            as a tuple with a bit mask (bit row * side + col) of the
+            pieces of each player, from player 1 up
+        turn (int): player whose turn it is
+        side (int): number of squares on each side of the board
+
+    Returns:
+        The Zobrist hash of the canonical form, the image with the
+        smallest tuple of masks (covering the turn, like position_hash),
+        and the symmetry that maps the position to it (the smallest
+        one, when several do)
+    """
+    transform = min(range(SYMMETRIES), key=candidates.__getitem__)
+    value = masks_hash(candidates[transform], side)
+    return value ^ zobrist_keys(side)[1][turn], transform
+
+
+def masks_hash(masks: Sequence[int], side: int) -> int:
+    """
+    Returns the Zobrist hash of the pieces given as one bit mask
+    (bit row * side + col) per player, from player 1 up, without the
+    key of the turn
+    """
+    value = 0
+    num_bytes = (side * side + 7) // 8
+    for player, mask in enumerate(masks, 1):
+        tables = zobrist_byte_keys(side, player)
+        for index, byte in enumerate(mask.to_bytes(num_bytes, "little")):
+            value ^= tables[index][byte]
+    return value
+
+
+@lru_cache(maxsize=None)
+def _digit_tables(player: int) -> Tuple[bytes, bytes]:
+    """
+    Returns the byte translation tables that turn squares owned by
+    player into b"1" and the others into b"0", and back from b"1" to
+    player and b"0" to 0
+    """
+    to_digits = bytes(ord("1") if value == player else ord("0")
+                      for value in range(256))
+    from_digits = bytes(player if value == ord("1") else 0
+                        for value in range(256))
+    return to_digits, from_digits
+
+
+def bytes_to_masks(data: bytes, players: int) -> List[int]:
+    """
+    Converts a board given as one byte per square (row by row, 0 for
+    an empty square) into one bit mask per player, from player 1 up.
+    Each mask is built with a translation and an int conversion, so
+    no Python code runs per square.
+    """
+    return [int(data.translate(_digit_tables(player)[0])[::-1], 2)
+            for player in range(1, players + 1)]
+
+
+def masks_to_bytes(masks: Sequence[int], side: int) -> bytes:
+    """
+    Converts one bit mask per player, from player 1 up, into a board
+    given as one byte per square (row by row, 0 for an empty square).
+    The masks must not overlap.
+    """
+    num_squares = side * side
+    total = 0
+    for player, mask in enumerate(masks, 1):
+        digits = format(mask, f"0{num_squares}b").encode()
+        # the players own different squares, so adding up their bytes
+        # never carries from one square to the next
+        total += int.from_bytes(digits.translate(_digit_tables(player)[1]),
+                                "big")
+    return total.to_bytes(num_squares, "little")
+
+
+@lru_cache(maxsize=None)
+def zobrist_byte_keys(side: int, player: int) -> List[List[int]]:
+    """
+    Returns, for every byte of a mask of a player's pieces (bit
+    row * side + col), the XOR of the Zobrist keys of the squares set
+    in each of its 256 values, so that a mask is hashed a byte at a
+    time instead of a piece at a time
+    """
+    square_keys = zobrist_keys(side)[0]
+    tables = []
+    for start in range(0, side * side, 8):
+        keys = [square_keys[square][player]
+                for square in range(start, min(start + 8, side * side))]
+        table = [0] * 256
+        for byte in range(1, 256):
+            low = byte & -byte
+            bit = low.bit_length() - 1
+            table[byte] = table[byte ^ low] ^ (keys[bit] if bit < len(keys)
+                                               else 0)
+        tables.append(table)
+    return tables
+
+
 class Piece:
     """
     Class to represent pieces
     """
+    __slots__ = ("_player_value", "_location")
+
     player: int
     location: Tuple[int,int]
     def __init__(self, player: int, location: Tuple[int, int]):
@@ -40,36 +280,71 @@ class Board:
     """
     Class to represent a game board.
 
+    The squares are stored in a mailbox (see mailbox_layout) and
+    identified by their cell index in it.
+
     Attributes:
-        rows (int): number of rows
-        cols (int): number of columns
-        board (list): the game board
-        location_of_pieces (dictionary): the location of each piece on the board
+        side (int): number of squares on each side of the board
+        width (int): number of cells in each row of the mailbox
+        cells (bytearray): the owner of every cell, 0 if the square
+            is empty, or BORDER if the cell is outside of the board
+        counts (array): the number of pieces of each player, indexed
+            by player (index 0 counts the empty squares)
+        hash (int): Zobrist hash of the pieces on the board
 
     Methods:
         add_piece: add a piece represented by a string to the board
+        remove_piece: remove the piece at a location from the board
+        square: the cell index of a location
+        place: put a player's piece on a cell
+        clear: remove the piece on a cell
+        count: number of pieces a player has on the board
+        copy: copy the board
     """
+    __slots__ = ("_side", "_width", "_cells", "_counts", "_keys", "_hash")
+
     side: int
-    board: List[List[Optional[Piece]]]
-    location_of_pieces: Dict[str, List[Tuple[int, int]]]
+    width: int
+    cells: bytearray
+    counts: array
 
     def __init__(self, size):
         self._side = size
-        self._board = [[None] * self._side for _ in range(self._side)]
-        self._location_of_pieces = {}
+        self._width = size + 2
+        self._cells = bytearray([BORDER]) * (self._width * self._width)
+        for start in range(self._width + 1, self._width * (size + 1),
+                           self._width):
+            self._cells[start:start + size] = bytes(size)
+        self._counts = array("h", [0]) * (MAX_PLAYERS + 1)
+        self._counts[0] = size * size
+        self._keys = mailbox_keys(size)
+        self._hash = 0
+
 
-    
     @property
-    def list_board(self):
-        return self._board
+    def list_board(self) -> BoardGridType:
+        side = self._side
+        cells = self._cells
+        return [[value or None for value in cells[start:start + side]]
+                for start in range(self._width + 1,
+                                   self._width * (side + 1), self._width)]
 
 
     @property
     def piece_count(self):
-        sum = 0
-        for value in self._location_of_pieces.values():
-            sum += len(value)
-        return sum
+        return self._side * self._side - self._counts[0]
+
+    def count(self, player: int) -> int:
+        """
+        Returns the number of pieces a player has on the board
+        """
+        return self._counts[player]
+
+    def square(self, location: Tuple[int, int]) -> int:
+        """
+        Returns the cell index of a (row, column) location
+        """
+        return (location[0] + 1) * self._width + location[1] + 1
 
     def add_piece(self, player: int, location: Tuple[int, int]) -> None:
         """
@@ -80,18 +355,85 @@ class Board:
             location (tuple): the (row, column) location of where to add
                 the piece
         """
-        row, col = location
+        self.place(player,
+                   (location[0] + 1) * self._width + location[1] + 1)
+
+    def remove_piece(self, location: Tuple[int, int]) -> None:
+        """
+        Remove the piece at a location from the board, if any.
+
+        Inputs:
+            location (tuple): the (row, column) location of the piece
+        """
+        self.clear((location[0] + 1) * self._width + location[1] + 1)
+
+    def place(self, player: int, square: int) -> None:
+        """
+        Put a piece of a player on a cell, replacing the piece
+        that was there, if any.
+
+        Inputs:
+            player (int): the player the piece belongs to
+            square (int): the cell index of the square
+        """
+        previous = self._cells[square]
+        keys = self._keys[square]
+        self._hash ^= keys[previous] ^ keys[player]
+        self._cells[square] = player
+        self._counts[previous] -= 1
+        self._counts[player] += 1
+
+    def clear(self, square: int) -> None:
+        """
+        Remove the piece on a cell, if any.
+
+        Inputs:
+            square (int): the cell index of the square
+        """
+        player = self._cells[square]
+        if player:
+            self._cells[square] = 0
+            self._counts[player] -= 1
+            self._counts[0] += 1
+            self._hash ^= self._keys[square][player]
+
+    def load(self, data: bytes) -> None:
+        """
+        Replaces every piece on the board, in time proportional to the
+        number of squares: each row is copied into the mailbox at once,
+        and the counts and hash are taken from the whole board at once.
+
+        Inputs:
+            data (bytes): the owner of every square, row by row (0 for
+                an empty square); assumed to be valid
+        """
+        side = self._side
+        width = self._width
+        cells = self._cells
+        for row in range(side):
+            start = (row + 1) * width + 1
+            cells[start:start + side] = data[row * side:(row + 1) * side]
+        for player in range(MAX_PLAYERS + 1):
+            self._counts[player] = data.count(player)
+        self._hash = masks_hash(bytes_to_masks(data, max(data, default=0)),
+                                side)
+
+    def copy(self) -> "Board":
+        """
+        Returns a copy of the board that shares no state with it
+        """
+        new_board = Board.__new__(Board)
+        new_board._side = self._side
+        new_board._width = self._width
+        new_board._cells = bytearray(self._cells)
+        new_board._counts = array("h", self._counts)
+        new_board._keys = self._keys
+        new_board._hash = self._hash
+        return new_board
 
-        self._board[row][col] = player
-        if player in self._location_of_pieces:
-            if location not in self._location_of_pieces[player]:
-                self._location_of_pieces[player].append(location)
-        else:
-            self._location_of_pieces[player] = [location]
-    
     def get_piece(self, pos):
-        if pos[0] <= len(self._board) and pos[1] <= len(self._board[0]):
-            return self._board[pos[0]][pos[1]]
+        if 0 <= pos[0] < self._side and 0 <= pos[1] < self._side:
+            return self._cells[self.square(pos)] or None
         else:
             return "Position not on the board"
     
@@ -111,7 +453,13 @@ direction_list = [
 class ReversiBase(ABC):
     """
     Abstract base class for the game of Reversi
+
+    Only the methods of the original game are abstract. The others
+    (hashing, move lookahead, undo and the bulk loaders) have default
+    implementations built on grid, turn, apply_move and load_game,
+    which the engines override with faster ones.
     """
+    __slots__ = ("_side", "_players", "_othello", "_saved_positions")
 
     _side: int
     _players: int
@@ -197,6 +545,42 @@ class ReversiBase(ABC):
         """
         raise NotImplementedError
 
+    @property
+    def position_hash(self) -> int:
+        """
+        Returns a 64-bit Zobrist hash of the position, covering the
+        pieces on the board and whose turn it is. Positions that
+        hash differently are different; equal hashes identify the
+        same position with overwhelming probability.
+        """
+        masks = bytes_to_masks(self._grid_bytes(self.grid), self._players)
+        return masks_hash(masks, self._side) ^ \
+            zobrist_keys(self._side)[1][self.turn]
+
+    def canonical_key(self) -> Tuple[int, int]:
+        """
+        Returns a 64-bit hash of the position that is the same for all
+        its rotations and reflections, and the symmetry (as numbered
+        by transform_position) that maps the position to the canonical
+        form the hash was taken of. A move found for the canonical form
+        is mapped back to the position with inverse_transform.
+
+        The canonical form does not depend on the engine, so engines
+        agree on the key of a position.
+        """
+        side = self._side
+        tables = symmetry_tables(side)
+        images = [[0] * self._players for _ in range(SYMMETRIES)]
+        for row, values in enumerate(self.grid):
+            for col, owner in enumerate(values):
+                if owner is None:
+                    continue
+                square = row * side + col
+                for transform, table in enumerate(tables):
+                    images[transform][owner - 1] |= 1 << table[square]
+        return canonical_masks([tuple(image) for image in images],
+                               self.turn, side)
+
     @property
     @abstractmethod
     def outcome(self) -> List[int]:
@@ -251,6 +635,48 @@ class ReversiBase(ABC):
         """
         raise NotImplementedError
 
+    def flips_for_move(self, pos: Tuple[int, int]) -> ListMovesType:
+        """
+        Returns the pieces that would be flipped if the current
+        player (as returned by the turn method) placed a piece
+        in the specified position, without altering the game.
+
+        Args:
+            pos: Position on the board
+
+        Raises:
+            ValueError: If the specified position is outside
+            the bounds of the board.
+
+        Returns: The list of positions of the flipped pieces
+        """
+        row, col = pos
+        side = self._side
+        if row > side - 1 or col > side - 1 or row < 0 or col < 0:
+            raise ValueError("Position is outside of the board")
+        grid = self.grid
+        player = self.turn
+        flips = []
+        for d_row, d_col in direction_list:
+            line = []
+            r, c = row + d_row, col + d_col
+            while 0 <= r < side and 0 <= c < side and \
+                    grid[r][c] is not None and grid[r][c] != player:
+                line.append((r, c))
+                r, c = r + d_row, c + d_col
+            if 0 <= r < side and 0 <= c < side and grid[r][c] == player:
+                flips.extend(line)
+        return flips
+
+    def moves_with_flips(self) -> Dict[Tuple[int, int], ListMovesType]:
+        """
+        Returns every move available to the current player (in
+        the same order as available_moves), each with the list of
+        pieces it would flip, without altering the game.
+        """
+        return {move: self.flips_for_move(move)
+                for move in self.available_moves}
+
     @abstractmethod
     def apply_move(self, pos: Tuple[int, int]) -> None:
         """
@@ -286,6 +712,49 @@ class ReversiBase(ABC):
         """
         raise NotImplementedError
 
+    def push_move(self, pos: Tuple[int, int]) -> None:
+        """
+        Applies a move like apply_move, recording what it changed
+        so that it can be undone with pop_move.
+
+        Unlike simulate_moves, this alters the state of the game,
+        but it does not copy it, which makes it suitable for
+        exploring many lines of play from one object.
+
+        Args:
+            pos: Position on the board
+
+        Raises:
+            ValueError: If the specified position is outside
+            the bounds of the board.
+
+        Returns: None
+        """
+        # the default saves the whole position, which load_game
+        # restores in pop_move
+        saved = (self.turn, self.grid)
+        self.apply_move(pos)
+        try:
+            self._saved_positions.append(saved)
+        except AttributeError:
+            self._saved_positions = [saved]
+
+    def pop_move(self) -> None:
+        """
+        Undoes the last move applied with push_move, restoring
+        the state of the game from before that move.
+
+        Raises:
+            IndexError: If there is no move to undo
+
+        Returns: None
+        """
+        try:
+            turn, grid = self._saved_positions.pop()
+        except AttributeError:
+            raise IndexError("pop from empty list") from None
+        self.load_game(turn, grid)
+
     @abstractmethod
     def load_game(self, turn: int, grid: BoardGridType) -> None:
         """
@@ -312,6 +781,179 @@ class ReversiBase(ABC):
         """
         raise NotImplementedError
 
+    def load_bytes(self, turn: int, data: bytes,
+                   validate: bool = True) -> None:
+        """
+        Loads the state of a game from one byte per square, replacing
+        the current state of the game in time proportional to the
+        number of squares.
+
+        Args:
+            turn: The player number of the player that
+            would make the next move
+            data: The owner of every square, row by row, with 0
+            for an empty square
+            validate: Whether to check the squares (the turn is always
+            checked). Loaders that have checked a whole dataset at
+            once can skip the check.
+
+        Raises:
+             ValueError:
+             - If the value of turn is inconsistent
+               with the _players attribute.
+             - If the length of data is not the number of squares.
+             - If any square holds a value above the number of players.
+
+        Returns: None
+        """
+        self._check_turn(turn)
+        if validate:
+            self._check_bytes(data)
+        side = self._side
+        self.load_game(turn, [[data[row * side + col] or None
+                               for col in range(side)]
+                              for row in range(side)])
+
+    def load_masks(self, turn: int, masks: Sequence[int],
+                   validate: bool = True) -> None:
+        """
+        Loads the state of a game from one bit mask (bit
+        row * side + col) per player, from player 1 up, replacing the
+        current state of the game.
+
+        Args:
+            turn: The player number of the player that
+            would make the next move
+            masks: The pieces of each player
+            validate: Whether to check the masks (the turn is always
+            checked)
+
+        Raises:
+             ValueError:
+             - If the value of turn is inconsistent
+               with the _players attribute.
+             - If there is not one mask per player, a mask has bits
+               outside of the board, or two masks overlap.
+
+        Returns: None
+        """
+        self._check_turn(turn)
+        if validate:
+            self._check_masks(masks)
+        self.load_bytes(turn, masks_to_bytes(masks, self._side),
+                        validate=False)
+
+    def load_numpy(self, turn: int, board: "np.ndarray") -> None:
+        """
+        Loads the state of a game from a (side x side) integer NumPy
+        array with the owner of every square (0 for an empty square),
+        checking the whole array at once. Requires NumPy.
+
+        Raises:
+             ValueError: As load_bytes, or if the array does not have
+             the shape of the board or does not hold integers
+
+        Returns: None
+        """
+        # imported here so that NumPy is only needed for this loader
+        import numpy as np
+
+        board = np.asarray(board)
+        if board.shape != (self._side, self._side):
+            raise ValueError("the size of the grid is inconsistent with the"
+                " size of the original grid")
+        if not np.issubdtype(board.dtype, np.integer):
+            raise ValueError("the grid must hold integers")
+        if board.min() < 0 or board.max() > self._players:
+            raise ValueError("the value in the grid is inconsistent"
+                " with the number of players")
+        self.load_bytes(turn, board.astype(np.uint8).tobytes(),
+                        validate=False)
+
+    @classmethod
+    def from_bytes(cls, side: int, players: int, othello: bool, turn: int,
+                   data: bytes) -> "ReversiBase":
+        """
+        Creates a game in the state given by data (see load_bytes)
+        """
+        game = cls(side, players, othello)
+        game.load_bytes(turn, data)
+        return game
+
+    @classmethod
+    def from_masks(cls, side: int, players: int, othello: bool, turn: int,
+                   masks: Sequence[int]) -> "ReversiBase":
+        """
+        Creates a game in the state given by masks (see load_masks)
+        """
+        game = cls(side, players, othello)
+        game.load_masks(turn, masks)
+        return game
+
+    @classmethod
+    def from_numpy(cls, side: int, players: int, othello: bool, turn: int,
+                   board: "np.ndarray") -> "ReversiBase":
+        """
+        Creates a game in the state given by a NumPy array (see
+        load_numpy)
+        """
+        game = cls(side, players, othello)
+        game.load_numpy(turn, board)
+        return game
+
+    def _check_turn(self, turn: int) -> None:
+        """
+        Raises ValueError if turn is not a player of the game
+        """
+        if turn > self._players or turn <= 0:
+            raise ValueError("the value of turn is inconsistent with the"
+                " number of players")
+
+    def _check_bytes(self, data: bytes) -> None:
+        """
+        Raises ValueError if data is not a valid board for load_bytes
+        """
+        if len(data) != self._side * self._side:
+            raise ValueError("the size of the grid is inconsistent with the"
+                " size of the original grid")
+        if max(data, default=0) > self._players:
+            raise ValueError("the value in the grid is inconsistent"
+                " with the number of players")
+
+    def _check_masks(self, masks: Sequence[int]) -> None:
+        """
+        Raises ValueError if masks are not valid for load_masks
+        """
+        if len(masks) != self._players:
+            raise ValueError("there must be one mask per player")
+        full = (1 << self._side * self._side) - 1
+        occupied = 0
+        for mask in masks:
+            if mask < 0 or mask & ~full or mask & occupied:
+                raise ValueError("the masks are outside of the board or"
+                    " overlap")
+            occupied |= mask
+
+    def _grid_bytes(self, grid: BoardGridType) -> bytes:
+        """
+        Checks a grid for load_game and converts it to the form
+        load_bytes takes
+
+        Raises:
+            ValueError: If the grid does not have the size of the board
+            or holds a value that is not a player
+        """
+        side = self._side
+        if len(grid) != side or any(len(row) != side for row in grid):
+            raise ValueError("the size of the grid is inconsistent with the"
+                " size of the original grid")
+        if any(value is not None and not 0 < value <= self._players
+               for row in grid for value in row):
+            raise ValueError("the value in the grid is inconsistent"
+                " with the number of players")
+        return bytes(0 if value is None else value
+                     for row in grid for value in row)
+
     @abstractmethod
     def simulate_moves(self,
                        moves: ListMovesType
@@ -354,48 +996,27 @@ class ReversiBase(ABC):
         """
         raise NotImplementedError
 
-def possible_moves(direction_list: List, own_pieces: List, enemy_pieces: List,
-                    rows: int, cols: int) -> List[Tuple[int, int]]:
-    """
-    Takes list of all pieces and compiles list of moves depending on color
-
-    Inputs:
-        direction_list (list): list of all possible directions as tuples
-        own_pieces (list): list of friendly pieces
-        enemy_pieces (list): list of enemy pieces
-        rows (int): number of rows
-        cols (int): number of columns
-
-    Returns:
-        List of possible moves for friendly
-    """
-    moves: set
-    sum: Tuple
-
-    moves = set()
-    for p in own_pieces:
-        for direction in direction_list:
-            sum = tuple(map(operator.add, p, direction))
-            if sum in enemy_pieces:
-                while sum in enemy_pieces:
-                    sum = tuple(map(operator.add, sum, direction))
-                if (sum[0] >= 0 and sum[1] >= 0) and (sum[0] < rows and 
-                                                      sum[1] < cols):
-                    if sum in enemy_pieces or sum in own_pieces:
-                        pass
-                    else:
-                        moves.add(sum)
-    return list(moves)
-
 
 class Reversi(ReversiBase):
     """
     Reversi game
     """
+    __slots__ = ("_grid", "_turn", "_num_moves", "_undo_stack", "_legal",
+                 "_legal_stale", "_done", "_outcome", "_turn_keys", "_offsets",
+                 "_positions", "_everyone")
 
     _grid: Board
     _turn: int
     _num_moves: int
+    _undo_stack: List[UndoType]
+    _legal: Dict[int, Set[int]]
+    _legal_stale: bool
+    _done: bool
+    _outcome: List[int]
+    _turn_keys: List[int]
+    _offsets: Tuple[int, ...]
+    _positions: List[Optional[Tuple[int, int]]]
+    _everyone: int
 
     def __init__(self, side: int, players: int, othello: bool):
         """
@@ -419,6 +1040,9 @@ class Reversi(ReversiBase):
         if side <= 3:
             raise ValueError("The board must be of size 4x4 or above")
         self._grid = Board(side)
+        self._turn_keys = zobrist_keys(side)[1]
+        _, self._offsets, self._positions = mailbox_layout(side)
+        self._everyone = (1 << players + 1) - 2
         if othello:
             smaller_side = side // 2 - 1
             larger_side = side // 2
@@ -429,7 +1053,10 @@ class Reversi(ReversiBase):
 
         self._turn = 1
         self._num_moves = 0
-        
+        self._undo_stack = []
+        self._legal = {}
+        self._legal_stale = True
+        self._update_status()
 
     #
     # PROPERTIES
@@ -498,70 +1125,14 @@ class Reversi(ReversiBase):
         If the game is over, this property will not return
         any meaningful value.
         """
-        direction_list: List[Tuple[int, int]]
-        own_pieces: List[Tuple[int, int]]
-        enemy_pieces: List[Tuple[int, int]]
-
-        own_pieces = []
-        enemy_pieces = []
-        moves = []
-
-        # Othello Check
-        possible_moves_list = []
-        othello_moves = []
-        all_pieces = []
-        for piece_list in self._grid._location_of_pieces.values():
-            for piece in piece_list:
-                all_pieces.append(piece)
-        for row in range(self.odd_smaller_side, self.odd_larger_side):
-            for col in range(self.odd_smaller_side, self.odd_larger_side):
-                othello_moves.append((row, col))
-        if not self._othello and self._grid.piece_count < self.num_players**2:
-            for move in othello_moves:
-                if move not in all_pieces:
-                    moves.append(move)
-            return moves
-                    
-        direction_list = [
-            (0, 1), #right
-            (1, 1), #right-down
-            (1, 0), #down
-            (1, -1), #left-down
-            (0, -1), #left
-            (-1, -1), #left-up
-            (-1, 0), #up
-            (-1, 1) #right-up
-        ]
-        if self._turn in self._grid._location_of_pieces:
-            own_pieces = self._grid._location_of_pieces[self._turn]
-        if self._grid._location_of_pieces:
-            for key, value in self._grid._location_of_pieces.items():
-                if key != self._turn:
-                    for loc in value:
-                        enemy_pieces.append(loc)
-        possible_moves_list = possible_moves(direction_list, own_pieces,
-            enemy_pieces, self.size, self.size)
-        if possible_moves_list:
-            for p_move in possible_moves_list:
-                moves.append(p_move)
-        return moves
+        return self._moves_for(self._turn)
 
     @property
     def done(self) -> bool:
         """
         Returns True if the game is over, False otherwise.
         """
-        i = 0
-        while i < self.num_players:
-            if not self.available_moves:
-                if self._turn == self.num_players:
-                    self._turn = 1
-                else: 
-                    self._turn = self._turn + 1
-            else:
-                return False
-            i += 1
-        return True
+        return self._done
 
     @property
     def outcome(self) -> List[int]:
@@ -574,33 +1145,170 @@ class Reversi(ReversiBase):
         the list will contain more than one integer (representing
         the players who tied)
         """
-        winner: List[int]
-        winnner_piece_count = 0
-        winner = []
-        if self.done:
-            for k, v in self._grid._location_of_pieces.items():
-                if len(v) > winnner_piece_count:
-                    winner = []
-                    winner.append(k)
-                    winnner_piece_count = len(self._grid._location_of_pieces[k])
-                elif len(v) == winnner_piece_count:
-                    winner.append(k)
-        if len(winner) > 0:
-            return winner
-        else:
-            return []
-                
+        return list(self._outcome)
+
+    @property
+    def position_hash(self) -> int:
+        """
+        Returns a 64-bit Zobrist hash of the position, covering the
+        pieces on the board and whose turn it is.
+        """
+        return self._grid._hash ^ self._turn_keys[self._turn]
+
+    def canonical_key(self) -> Tuple[int, int]:
+        """
+        Returns a hash of the position that is the same for all its
+        rotations and reflections, and the symmetry that maps the
+        position to its canonical form (see ReversiBase.canonical_key)
+        """
+        side = self._side
+        tables = symmetry_tables(side)
+        images = [[0] * self._players for _ in range(SYMMETRIES)]
+        positions = self._positions
+        for cell, owner in enumerate(self._grid._cells):
+            if owner == 0 or owner == BORDER:
+                continue
+            row, col = positions[cell]
+            square = row * side + col
+            for transform, table in enumerate(tables):
+                images[transform][owner - 1] |= 1 << table[square]
+        return canonical_masks([tuple(image) for image in images],
+                               self._turn, side)
 
     #
     # METHODS
     #
     def helper_eating_function(self, eaten_list):
-        for key, value in self._grid._location_of_pieces.items():
-            for piece in eaten_list:
-                if piece in value:
-                    value.remove(piece)
-        for piece in eaten_list:
-            self._grid.add_piece(self._turn, piece)
+        for square in eaten_list:
+            self._grid.place(self._turn, square)
+
+    def _in_setup(self) -> bool:
+        """
+        Returns True while a non-othello game is still filling out
+        the middle of the board
+        """
+        return (not self._othello and
+                self._grid.piece_count < self.num_players**2)
+
+    def _moves_for(self, player: int) -> ListMovesType:
+        """
+        Returns the sorted list of positions where player could
+        place a piece
+        """
+        if self._in_setup():
+            cells = self._grid._cells
+            square = self._grid.square
+            moves = []
+            for row in range(self.odd_smaller_side, self.odd_larger_side):
+                for col in range(self.odd_smaller_side, self.odd_larger_side):
+                    if not cells[square((row, col))]:
+                        moves.append((row, col))
+            return moves
+        if self._legal_stale:
+            self._recompute_legal()
+        positions = self._positions
+        return [positions[square] for square in sorted(self._legal[player])]
+
+    def _has_moves(self, player: int) -> bool:
+        """
+        Returns True if player could place a piece anywhere
+        """
+        if self._in_setup():
+            return bool(self._moves_for(player))
+        if self._legal_stale:
+            self._recompute_legal()
+        return bool(self._legal[player])
+
+    def _legal_players(self, square: int) -> int:
+        """
+        Finds the players who could place a piece on the empty square
+        (outside of the non-othello setup), walking each ray once for
+        all of them: a player can play there if the ray holds their
+        piece after at least one piece, none of them theirs.
+
+        Returns: A bit mask with bit p set when player p can play there
+        """
+        cells = self._grid._cells
+        everyone = self._everyone
+        legal = 0
+        for offset in self._offsets:
+            cell = square + offset
+            first = cells[cell]
+            if not 0 < first < BORDER:
+                continue
+            cell += offset
+            owner = cells[cell]
+            while owner == first:
+                cell += offset
+                owner = cells[cell]
+            seen = 1 << first
+            while 0 < owner < BORDER:
+                bit = 1 << owner
+                if not seen & bit:
+                    seen |= bit
+                    legal |= bit
+                    if seen == everyone:
+                        break
+                cell += offset
+                owner = cells[cell]
+        return legal
+
+    def _recompute_legal(self) -> None:
+        """
+        Recomputes every player's set of legal moves from scratch
+        """
+        self._legal = {player: set()
+                       for player in range(1, self.num_players + 1)}
+        cells = self._grid._cells
+        square = cells.find(0)
+        while square >= 0:
+            legal = self._legal_players(square)
+            if legal:
+                for player, moves in self._legal.items():
+                    if legal >> player & 1:
+                        moves.add(square)
+            square = cells.find(0, square + 1)
+        self._legal_stale = False
+
+    def _update_legal(self, changed: List[int]) -> None:
+        """
+        Brings the sets of legal moves up to date after the pieces
+        on the changed squares were placed, flipped or removed.
+
+        Only the empty squares whose rays reach a changed square
+        (across occupied squares only) can have changed legality,
+        so only those are rechecked.
+        """
+        if self._in_setup():
+            self._legal_stale = True
+            return
+        if self._legal_stale:
+            self._recompute_legal()
+            return
+        cells = self._grid._cells
+        offsets = self._offsets
+        affected = set()
+        for square in changed:
+            if not cells[square]:
+                affected.add(square)
+            else:
+                for moves in self._legal.values():
+                    moves.discard(square)
+            for offset in offsets:
+                cell = square + offset
+                owner = cells[cell]
+                while owner and owner != BORDER:
+                    cell += offset
+                    owner = cells[cell]
+                if not owner:
+                    affected.add(cell)
+        for square in affected:
+            legal = self._legal_players(square)
+            for player, moves in self._legal.items():
+                if legal >> player & 1:
+                    moves.add(square)
+                else:
+                    moves.discard(square)
 
     def piece_at(self, pos: Tuple[int, int]) -> Optional[int]:
         """
@@ -621,7 +1329,7 @@ class Reversi(ReversiBase):
 
         if row > self.size - 1 or col > self.size - 1 or row < 0 or col < 0:
             raise ValueError("Position is outside of the board")
-        return self._grid._board[row][col]
+        return self._grid._cells[self._grid.square(pos)] or None
 
     def legal_move(self, pos: Tuple[int, int]) -> bool:
         """
@@ -651,9 +1359,38 @@ class Reversi(ReversiBase):
                 if col in range(self.odd_smaller_side, self.odd_larger_side):
                     return True
                 return False
-        if pos in self.available_moves:
-            return True
-        return False
+        if self._legal_stale:
+            self._recompute_legal()
+        return self._grid.square(pos) in self._legal[self._turn]
+
+    def flips_for_move(self, pos: Tuple[int, int]) -> ListMovesType:
+        """
+        Returns the pieces that would be flipped if the current
+        player (as returned by the turn method) placed a piece
+        in the specified position, without altering the game.
+
+        Args:
+            pos: Position on the board
+
+        Raises:
+            ValueError: If the specified position is outside
+            the bounds of the board.
+
+        Returns: The list of positions of the flipped pieces
+        """
+        row, col = pos
+        if row > self.size - 1 or col > self.size - 1 or row < 0 or col < 0:
+            raise ValueError("Position is outside of the board")
+        return self._eaten_pieces(pos)
+
+    def moves_with_flips(self) -> Dict[Tuple[int, int], ListMovesType]:
+        """
+        Returns every move available to the current player (in
+        the same order as available_moves), each with the list of
+        pieces it would flip, without altering the game.
+        """
+        return {move: self._eaten_pieces(move)
+                for move in self._moves_for(self._turn)}
 
     def apply_move(self, pos: Tuple[int, int]) -> None:
         """
@@ -687,60 +1424,121 @@ class Reversi(ReversiBase):
 
         Returns: None
         """
-        own_pieces = []
-        enemy_pieces = []
-        direction_list = [
-                (0, 1), #right
-                (1, 1), #right-down
-                (1, 0), #down
-                (1, -1), #left-down
-                (0, -1), #left
-                (-1, -1), #left-up
-                (-1, 0), #up
-                (-1, 1) #right-up
-            ]
-        if self._turn in self._grid._location_of_pieces:
-                own_pieces = self._grid._location_of_pieces[self._turn]
-        if self._grid._location_of_pieces:
-            for key, value in self._grid._location_of_pieces.items():
-                if key != self._turn:
-                    for loc in value:
-                        enemy_pieces.append(loc)
-
-        if not self.done:
-            self._grid.add_piece(self._turn, pos)
-            # turn pieces after move
-            for direction in direction_list:
-                eat_pieces_list = []
-                curr = tuple(map(operator.add, pos, direction))
-                if curr in enemy_pieces:
-                    eat_pieces_list.append(curr)
-                    while curr in enemy_pieces:
-                        curr = tuple(map(operator.add, curr, direction))
-                        #tuple unpack helper_eating_function
-                        c_row, c_col = curr
-                        if ((c_row >= 0 and c_col >= 0) and
-                            (c_row < self.size and c_col < self.size)):
-                            if curr in enemy_pieces:
-                                eat_pieces_list.append(curr)
-                                pass
-                            elif curr in own_pieces:
-                                self.helper_eating_function(eat_pieces_list)
-
-        i = 0
-        if self._turn != self.num_players:
-            self._turn = self._turn + 1
-            while not self.available_moves and i < self.num_players:
-                self._turn = self._turn + 1
-                if self._turn >= self.num_players:
-                    self._turn = 1
-                i += 1
-
-        elif self._turn == self.num_players:
-            self._turn = 1
-            while not self.available_moves and i < self.num_players:
-                self._turn = self._turn + 1
-                i += 1
+        self._make_move(pos)
+
+    def push_move(self, pos: Tuple[int, int]) -> None:
+        """
+        Applies a move like apply_move, recording what it changed
+        so that it can be undone with pop_move.
+
+        Args:
+            pos: Position on the board
+
+        Raises:
+            ValueError: If the specified position is outside
+            the bounds of the board.
+
+        Returns: None
+        """
+        self._undo_stack.append(self._make_move(pos))
+
+    def pop_move(self) -> None:
+        """
+        Undoes the last move applied with push_move, restoring
+        the flipped pieces and the turn.
+
+        Raises:
+            IndexError: If there is no move to undo
+
+        Returns: None
+        """
+        square, flipped, turn = self._undo_stack.pop()
+        if square is not None:
+            self._grid.clear(square)
+            for cell, owner in flipped:
+                self._grid.place(owner, cell)
+            self._update_legal([square] + [cell for cell, _ in flipped])
+        self._turn = turn
+        self._update_status()
+
+    def _eaten_squares(self, square: int) -> List[int]:
+        """
+        Returns the cells of the pieces that would be flipped if
+        the current player placed a piece on the cell square
+        """
+        cells = self._grid._cells
+        player = self._turn
+        eaten = []
+        for offset in self._offsets:
+            cell = square + offset
+            owner = cells[cell]
+            while owner != player and owner and owner != BORDER:
+                cell += offset
+                owner = cells[cell]
+            if owner == player:
+                eaten.extend(range(square + offset, cell, offset))
+        return eaten
+
+    def _eaten_pieces(self, pos: Tuple[int, int]) -> ListMovesType:
+        """
+        Returns the pieces that would be flipped if the current
+        player placed a piece at pos
+        """
+        positions = self._positions
+        return [positions[cell] for cell
+                in self._eaten_squares(self._grid.square(pos))]
+
+    def _make_move(self, pos: Tuple[int, int]) -> UndoType:
+        """
+        Places a piece for the current player, flips the pieces it
+        eats and advances the turn.
+
+        Raises:
+            ValueError: If the specified position is outside
+            the bounds of the board.
+
+        Returns: The cell the piece was placed on (None if the game
+        was already over), the flipped cells with their previous
+        owners, and the previous turn
+        """
+        row, col = pos
+        if row > self.size - 1 or col > self.size - 1 or row < 0 or col < 0:
+            raise ValueError("Position is outside of the board")
+        turn = self._turn
+        square = None
+        flipped = []
+        if not self._done:
+            cells = self._grid._cells
+            square = self._grid.square(pos)
+            eaten = self._eaten_squares(square)
+            flipped = [(cell, cells[cell]) for cell in eaten]
+            self._grid.place(self._turn, square)
+            self.helper_eating_function(eaten)
+            self._update_legal([square] + eaten)
+
+        self._turn = self._turn % self.num_players + 1
+        self._update_status()
+        return square, flipped, turn
+
+    def _update_status(self) -> None:
+        """
+        Moves the turn to the first player, starting with the current
+        one, that can make a move, and records whether the game is
+        over (and if so, who won). Called whenever the state changes,
+        so that done and outcome never have to compute anything.
+        """
+        for _ in range(self.num_players):
+            if self._has_moves(self._turn):
+                self._done = False
+                self._outcome = []
+                return
+            self._turn = self._turn % self.num_players + 1
+        counts = [self._grid.count(player)
+                  for player in range(1, self.num_players + 1)]
+        best = max(counts)
+        self._done = True
+        self._outcome = [player for player, count in enumerate(counts, 1)
+                         if count == best]
 
     def load_game(self, turn: int, grid: BoardGridType) -> None:
         """
@@ -765,24 +1563,25 @@ class Reversi(ReversiBase):
 
         Returns: None
         """
-        if turn > self.num_players or turn <= 0:
-            raise ValueError("the value of turn is inconsistent with the"\
-                " number of players")
-        if len(grid) != self.size:
-            raise ValueError("the size of the grid is inconsistent with the"
-                " size of the original grid")
-        for row in range(len(grid)):
-            for col in range(len(grid)):
-                player_at_loc = grid[row][col]
-                if player_at_loc is None:
-                    continue
-                elif player_at_loc < 0 or player_at_loc > self.num_players:
-                    raise ValueError("the value in the grid is inconsistent"\
-                    " with the number of players")
-                elif player_at_loc is not None:
-                    self._grid.add_piece(player_at_loc, (row, col))
+        self._check_turn(turn)
+        self.load_bytes(turn, self._grid_bytes(grid), validate=False)
 
+    def load_bytes(self, turn: int, data: bytes,
+                   validate: bool = True) -> None:
+        """
+        Loads the state of a game from one byte per square (see
+        ReversiBase.load_bytes), rewriting the whole board so that
+        no piece of the previous state is left behind
+        """
+        self._check_turn(turn)
+        if validate:
+            self._check_bytes(data)
+        self._grid.load(data)
         self._turn = turn
+        self._num_moves = 0
+        self._undo_stack = []
+        self._legal_stale = True
+        self._update_status()
 
     def simulate_moves(self,
                        moves: ListMovesType
@@ -823,7 +1622,11 @@ class Reversi(ReversiBase):
         the method was called on, reflecting the state
         of the game after applying the provided moves.
         """
-        new_game = deepcopy(self)
+        new_game = copy(self)
+        new_game._grid = self._grid.copy()
+        new_game._undo_stack = []
+        new_game._legal = {player: set(moves)
+                           for player, moves in self._legal.items()}
         for move in moves:
             new_game.apply_move(move)
         return new_game
@@ -0,0 +1,329 @@
+"""
+Alpha-beta search for Reversi.
+
+Works with any ReversiBase engine through push_move/pop_move, so the
+search never copies the game. Scores are always from the point of view
+of the player who started the search: that player maximizes and every
+other player minimizes (which, with more than two players, assumes the
+others are working together against the searching player).
+"""
+from functools import lru_cache
+import time
+from typing import Optional, Tuple
+
+from reversi import ListMovesType, ReversiBase
+from transposition import EXACT, LOWER, UPPER, TranspositionTable
+
+
+WIN_SCORE = 1000000
+"""
+Score of a won game, before adding the final piece difference.
+"""
+
+MOBILITY_WEIGHT = 2
+"""
+Score of each move available to the player whose turn it is.
+"""
+
+
+class SearchTimeout(Exception):
+    """
+    Raised inside a search when its time or node budget runs out
+    """
+
+
+@lru_cache(maxsize=None)
+def square_weights(side: int) -> Tuple[Tuple[int, ...], ...]:
+    """
+    Computes how much a piece on each square of a board is worth
+
+    Inputs:
+        side (int): number of squares on each side of the board
+
+    Returns:
+        The weight of every square, as a tuple of rows. Corners are
+        worth the most, edges more than the inside of the board, and
+        the squares next to an empty corner are penalized.
+    """
+    last = side - 1
+    weights = []
+    for row in range(side):
+        weights_row = []
+        for col in range(side):
+            on_edge_row = row in (0, last)
+            on_edge_col = col in (0, last)
+            near_row = row in (1, last - 1)
+            near_col = col in (1, last - 1)
+            if on_edge_row and on_edge_col:
+                weight = 20
+            elif near_row and near_col:
+                weight = -7
+            elif (on_edge_row and near_col) or (on_edge_col and near_row):
+                weight = -3
+            elif on_edge_row or on_edge_col:
+                weight = 4
+            else:
+                weight = 1
+            weights_row.append(weight)
+        weights.append(tuple(weights_row))
+    return tuple(weights)
+
+
+class SearchResult:
+    """
+    Class to represent the result of a search.
+
+    Attributes:
+        move (tuple): best move found
+        score (int): score of the best move
+        depth (int): depth of the last completed iteration
+        nodes (int): number of positions visited
+        seconds (float): time taken by the search
+        pv (list): principal variation, starting with move
+    """
+    move: Optional[Tuple[int, int]]
+    score: int
+    depth: int
+    nodes: int
+    seconds: float
+    pv: ListMovesType
+
+    def __init__(self, move: Optional[Tuple[int, int]], score: int,
+                 depth: int, nodes: int, seconds: float, pv: ListMovesType):
+        self.move = move
+        self.score = score
+        self.depth = depth
+        self.nodes = nodes
+        self.seconds = seconds
+        self.pv = pv
+
+    @property
+    def nodes_per_second(self) -> float:
+        """
+        Returns the number of positions visited per second
+        """
+        return self.nodes / self.seconds if self.seconds > 0 else 0.0
+
+
+class AlphaBetaSearch:
+    """
+    Class for an iterative deepening alpha-beta searcher.
+
+    Each iteration searches one ply deeper than the previous one,
+    trying the previous iteration's principal variation first, until
+    the time or node budget runs out or max_depth is reached. The move
+    of the last completed iteration is returned.
+
+    Attributes:
+        time_limit (float): seconds per search, or None for no limit
+        node_limit (int): positions per search, or None for no limit
+        max_depth (int): deepest iteration to search
+        table (TranspositionTable): table of results, or None. Scores
+            are stored from the searching player's point of view, so
+            a table should not be shared between players.
+        total_nodes (int): positions visited over all searches
+        total_seconds (float): time taken by all searches
+    """
+    time_limit: Optional[float]
+    node_limit: Optional[int]
+    max_depth: int
+    table: Optional[TranspositionTable]
+    total_nodes: int
+    total_seconds: float
+
+    def __init__(self, time_limit: Optional[float] = 1.0,
+                 node_limit: Optional[int] = None, max_depth: int = 64,
+                 table: Optional[TranspositionTable] = None):
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.max_depth = max_depth
+        self.table = table
+        self.total_nodes = 0
+        self.total_seconds = 0.0
+        self._player = 1
+        self._nodes = 0
+        self._deadline = None
+        self._prev_pv = []
+        self._horizon = False
+
+    @property
+    def nodes_per_second(self) -> float:
+        """
+        Returns the number of positions visited per second over
+        all searches
+        """
+        if self.total_seconds <= 0:
+            return 0.0
+        return self.total_nodes / self.total_seconds
+
+    def search(self, game: ReversiBase) -> SearchResult:
+        """
+        Finds the best move for the player whose turn it is.
+
+        The game is modified during the search, but is restored
+        to its original state before returning.
+
+        Args:
+            game: Game to search. Must not be over.
+
+        Returns: The result of the deepest completed iteration (or,
+        if not even the first one completed, the first legal move).
+        """
+        start = time.perf_counter()
+        self._player = game.turn
+        self._nodes = 0
+        self._deadline = None
+        if self.time_limit is not None:
+            self._deadline = start + self.time_limit
+        self._prev_pv = []
+
+        moves = game.available_moves
+        result = SearchResult(moves[0], 0, 0, 0, 0.0, [moves[0]])
+        for depth in range(1, self.max_depth + 1):
+            pv = []
+            self._horizon = False
+            try:
+                score = self._search(game, depth, -WIN_SCORE * 2,
+                                     WIN_SCORE * 2, 0, True, pv)
+            except SearchTimeout:
+                break
+            result = SearchResult(pv[0], score, depth, 0, 0.0, pv)
+            self._prev_pv = pv
+            if not self._horizon or abs(score) >= WIN_SCORE:
+                # searching deeper cannot change the result
+                break
+
+        result.nodes = self._nodes
+        result.seconds = time.perf_counter() - start
+        self.total_nodes += result.nodes
+        self.total_seconds += result.seconds
+        return result
+
+    def _check_budget(self) -> None:
+        """
+        Raises SearchTimeout if the time or node budget has run out
+        """
+        if self.node_limit is not None and self._nodes >= self.node_limit:
+            raise SearchTimeout
+        if (self._deadline is not None and self._nodes % 256 == 0
+                and time.perf_counter() >= self._deadline):
+            raise SearchTimeout
+
+    def _search(self, game: ReversiBase, depth: int, alpha: int, beta: int,
+                ply: int, on_pv: bool, pv: ListMovesType) -> int:
+        """
+        Searches a position to a given depth, filling pv with the
+        principal variation from it.
+
+        Returns: The score of the position, if it lies strictly between
+        alpha and beta; otherwise a bound on the score on the same side
+        of the window.
+        """
+        self._nodes += 1
+        self._check_budget()
+        if game.done:
+            return self._final_score(game)
+        if depth == 0:
+            self._horizon = True
+            return self._evaluate(game)
+
+        alpha_orig = alpha
+        beta_orig = beta
+        table_move = None
+        key = 0
+        if self.table is not None:
+            key = game.position_hash
+            entry = self.table.probe(key)
+            if entry is not None:
+                entry_depth, flag, score, table_move = entry
+                if entry_depth >= depth and not on_pv:
+                    # the stored result may itself have stopped at
+                    # the horizon
+                    self._horizon = True
+                    if flag == EXACT:
+                        return score
+                    if flag == LOWER:
+                        alpha = max(alpha, score)
+                    elif flag == UPPER:
+                        beta = min(beta, score)
+                    if alpha >= beta:
+                        return score
+
+        moves = game.available_moves
+        first = None
+        if on_pv and ply < len(self._prev_pv):
+            first = self._prev_pv[ply]
+        elif table_move is not None:
+            first = table_move
+        if first in moves:
+            moves.remove(first)
+            moves.insert(0, first)
+        else:
+            on_pv = False
+
+        maximizing = game.turn == self._player
+        best = -WIN_SCORE * 2 if maximizing else WIN_SCORE * 2
+        best_move = moves[0]
+        for i, move in enumerate(moves):
+            child_pv = []
+            game.push_move(move)
+            try:
+                score = self._search(game, depth - 1, alpha, beta, ply + 1,
+                                     on_pv and i == 0, child_pv)
+            finally:
+                game.pop_move()
+            if maximizing and score > best or not maximizing and score < best:
+                best = score
+                best_move = move
+                pv[:] = [move] + child_pv
+                if maximizing:
+                    alpha = max(alpha, score)
+                else:
+                    beta = min(beta, score)
+                if alpha >= beta:
+                    break
+
+        if self.table is not None:
+            if best <= alpha_orig:
+                flag = UPPER
+            elif best >= beta_orig:
+                flag = LOWER
+            else:
+                flag = EXACT
+            self.table.store(key, depth, flag, best, best_move)
+        return best
+
+    def _final_score(self, game: ReversiBase) -> int:
+        """
+        Scores a finished game: a win or loss for the searching
+        player, adjusted by how many pieces it won or lost by
+        """
+        counts = [0] * (game.num_players + 1)
+        for row in game.grid:
+            for value in row:
+                if value is not None:
+                    counts[value] += 1
+        own = counts[self._player]
+        best_other = max(count for player, count in enumerate(counts)
+                         if player not in (0, self._player))
+        winners = game.outcome
+        if self._player not in winners:
+            return -WIN_SCORE + own - best_other
+        if len(winners) == 1:
+            return WIN_SCORE + own - best_other
+        return 0
+
+    def _evaluate(self, game: ReversiBase) -> int:
+        """
+        Estimates the value of an unfinished game for the searching
+        player from where the pieces are and how many moves the
+        player to move has
+        """
+        player = self._player
+        score = 0
+        for row, weights in zip(game.grid, square_weights(game.size)):
+            for value, weight in zip(row, weights):
+                if value is not None:
+                    score += weight if value == player else -weight
+        mobility = MOBILITY_WEIGHT * len(game.available_moves)
+        return score + mobility if game.turn == player else score - mobility
@@ -0,0 +1,353 @@
+"""
+Asyncio game server for Reversi.
+
+Clients connect over TCP and talk in line-delimited JSON: every request
+is one JSON object on a line, and the server answers each one with one
+JSON object on a line, in order. A connection can hold several games at
+once; they belong to the connection and end when it closes.
+
+Requests:
+    {"op": "new", "side": 8, "players": 2, "othello": true,
+     "bots": {"2": "smart"}}
+        Starts a game. bots maps the players played by the server to
+        their strategy (see bot.STRATEGIES); the others are played by
+        the client. All fields are optional, with the defaults above.
+    {"op": "move", "game": 1, "move": [2, 3]}
+        Plays a move for the player to move, then lets the server's
+        bots move until it is the client's turn again or the game ends.
+    {"op": "state", "game": 1}
+        Returns the state of a game.
+    {"op": "close", "game": 1}
+        Ends a game.
+
+Replies carry "ok": true with the game's "game" id, "grid", "turn",
+"moves" (the legal moves of the player to move), "done", "outcome"
+and "bot_moves" (the moves the server's bots just played), or
+"ok": false with an "error" message. Moves are checked with
+legal_move before being applied, so a bad request never reaches the
+engine.
+
+Bot moves other than random ones are computed on a pool of worker
+processes, so a slow search never stalls the event loop serving the
+other games.
+
+Usage:
+    python server.py [-H host] [-p port] [-w workers] [-t time_limit]
+                     [-e bitboard]
+"""
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
+import random
+import sys
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from reversi import MAX_PLAYERS, BoardGridType, Reversi, ReversiBase
+from bitboard import BitboardReversi
+from bot import STRATEGIES, Bot
+
+
+MAX_GAMES = 256
+"""
+Largest number of games a connection can have open at once.
+"""
+
+MAX_SIDE = 16
+"""
+Largest board side a client can ask for.
+"""
+
+_bots: Dict[str, Bot] = {}
+"""
+Bots of a worker process, by strategy, kept from one reply to the next.
+"""
+
+
+def bot_reply(engine: Type[ReversiBase], side: int, players: int,
+              othello: bool, turn: int, grid: BoardGridType, strat: str,
+              time_limit: float) -> Tuple[int, int]:
+    """
+    Computes a bot's move in a worker process
+
+    Inputs:
+        engine (type): engine class to rebuild the game with
+        side, players, othello: kind of game
+        turn (int): player to move
+        grid (list): board of the game
+        strat (str): strategy of the bot
+        time_limit (float): seconds per move of the search bots
+
+    Returns:
+        The move the bot plays
+    """
+    bot = _bots.get(strat)
+    if bot is None:
+        bot = Bot(strat, time_limit)
+        _bots[strat] = bot
+    game = engine(side, players, othello)
+    game.load_game(turn, grid)
+    return bot.move(game)
+
+
+class GameSession:
+    """
+    Class to represent a game hosted by the server.
+
+    Attributes:
+        game (ReversiBase): the game
+        othello (bool): whether the game started from an Othello
+            configuration
+        bots (dict): strategy of each player played by the server
+    """
+    game: ReversiBase
+    othello: bool
+    bots: Dict[int, str]
+
+    def __init__(self, game: ReversiBase, othello: bool,
+                 bots: Dict[int, str]):
+        self.game = game
+        self.othello = othello
+        self.bots = bots
+
+    def state(self, game_id: int,
+              bot_moves: List[Tuple[int, int]]) -> Dict[str, Any]:
+        """
+        Returns the reply describing the game
+        """
+        game = self.game
+        return {"ok": True, "game": game_id, "grid": game.grid,
+                "turn": game.turn, "moves": game.available_moves,
+                "done": game.done, "outcome": game.outcome,
+                "bot_moves": bot_moves}
+
+
+class GameServer:
+    """
+    Class for a server hosting games for many connections at once.
+
+    Attributes:
+        engine (type): engine class the games are played with
+        time_limit (float): seconds per move of the search bots
+        connections (int): connections currently open
+        games (int): games currently open
+        moves (int): moves played so far, by clients and bots
+    """
+    engine: Type[ReversiBase]
+    time_limit: float
+    connections: int
+    games: int
+    moves: int
+
+    def __init__(self, executor: Optional[ProcessPoolExecutor],
+                 engine: Type[ReversiBase] = Reversi,
+                 time_limit: float = 0.1):
+        """
+        Constructor
+
+        Args:
+            executor: Pool computing the bots' moves, or None to
+            compute them on the event loop
+            engine: Engine class to play the games with
+            time_limit: Seconds per move of the search bots
+        """
+        self.engine = engine
+        self.time_limit = time_limit
+        self.connections = 0
+        self.games = 0
+        self.moves = 0
+        self._executor = executor
+        self._rng = random.Random()
+        self._local_bots = {}
+
+    async def handle(self, reader: asyncio.StreamReader,
+                     writer: asyncio.StreamWriter) -> None:
+        """
+        Serves one connection until the client closes it
+        """
+        sessions = {}
+        next_id = 1
+        self.connections += 1
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("A request must be a JSON object")
+                    if request.get("op") == "new":
+                        next_id += 1
+                        reply = await self._new_game(sessions, next_id - 1,
+                                                     request)
+                    else:
+                        reply = await self._game_request(sessions, request)
+                except ValueError as error:
+                    reply = {"ok": False, "error": str(error)}
+                except Exception as error:
+                    # a bot worker failed; the request fails, but the
+                    # connection and its other games carry on
+                    reply = {"ok": False, "error": "Internal error: "
+                             f"{type(error).__name__}: {error}"}
+                writer.write(json.dumps(reply).encode() + b"\n")
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            # the client went away, or sent a line longer than the
+            # stream's limit
+            pass
+        finally:
+            self.connections -= 1
+            self.games -= len(sessions)
+            writer.close()
+
+    async def _new_game(self, sessions: Dict[int, GameSession],
+                        game_id: int,
+                        request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Starts a game for a "new" request
+
+        Raises:
+            ValueError: If the request is malformed or the connection
+            has too many games open
+        """
+        if len(sessions) >= MAX_GAMES:
+            raise ValueError("Too many games open on this connection")
+        side = request.get("side", 8)
+        players = request.get("players", 2)
+        othello = request.get("othello", True)
+        bots = request.get("bots", {"2": "smart"})
+        if not isinstance(side, int) or not isinstance(players, int) \
+                or not isinstance(othello, bool) \
+                or not isinstance(bots, dict):
+            raise ValueError("Malformed game settings")
+        if side > MAX_SIDE or not 2 <= players <= min(side, MAX_PLAYERS):
+            raise ValueError("Unsupported board side or number of players")
+        bot_players = {}
+        for player, strat in bots.items():
+            if not str(player).isdigit() or \
+                    not 1 <= int(player) <= players:
+                raise ValueError(f"Unknown player {player}")
+            if strat not in STRATEGIES:
+                raise ValueError(f"Unknown strategy {strat}")
+            bot_players[int(player)] = strat
+        session = GameSession(self.engine(side, players, othello), othello,
+                              bot_players)
+        sessions[game_id] = session
+        self.games += 1
+        try:
+            bot_moves = await self._play_bots(session)
+        except Exception:
+            # the client never learns the id of a game that fails to
+            # start, so it could not close it
+            del sessions[game_id]
+            self.games -= 1
+            raise
+        return session.state(game_id, bot_moves)
+
+    async def _game_request(self, sessions: Dict[int, GameSession],
+                            request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Serves a "move", "state" or "close" request
+
+        Raises:
+            ValueError: If the request is malformed, the game is not
+            open, or the move is not legal
+        """
+        op = request.get("op")
+        game_id = request.get("game")
+        if not isinstance(game_id, int) or game_id not in sessions:
+            raise ValueError(f"No open game {game_id}")
+        session = sessions[game_id]
+        if op == "state":
+            return session.state(game_id, [])
+        if op == "close":
+            del sessions[game_id]
+            self.games -= 1
+            return {"ok": True, "game": game_id}
+        if op != "move":
+            raise ValueError(f"Unknown op {op}")
+
+        move = request.get("move")
+        if not isinstance(move, list) or len(move) != 2 or \
+                not all(isinstance(value, int) for value in move):
+            raise ValueError("A move must be a [row, col] pair")
+        game = session.game
+        move = (move[0], move[1])
+        if game.done:
+            raise ValueError("The game is over")
+        # legal_move raises ValueError for moves off the board
+        if not game.legal_move(move):
+            raise ValueError(f"Illegal move {list(move)}")
+        game.apply_move(move)
+        self.moves += 1
+        bot_moves = await self._play_bots(session)
+        return session.state(game_id, bot_moves)
+
+    async def _play_bots(self,
+                         session: GameSession) -> List[Tuple[int, int]]:
+        """
+        Plays the server's bots until it is a client player's turn or
+        the game is over
+
+        Returns: The moves the bots played
+        """
+        game = session.game
+        moves = []
+        while not game.done and game.turn in session.bots:
+            strat = session.bots[game.turn]
+            if strat == "random":
+                move = self._rng.choice(game.available_moves)
+            elif self._executor is None:
+                if strat not in self._local_bots:
+                    self._local_bots[strat] = Bot(strat, self.time_limit)
+                move = self._local_bots[strat].move(game)
+            else:
+                loop = asyncio.get_running_loop()
+                move = await loop.run_in_executor(
+                    self._executor, bot_reply, self.engine, game.size,
+                    game.num_players, session.othello, game.turn,
+                    game.grid, strat, self.time_limit)
+            game.apply_move(move)
+            self.moves += 1
+            moves.append(move)
+        return moves
+
+
+async def serve(host: str, port: int, workers: int,
+                engine: Type[ReversiBase], time_limit: float) -> None:
+    """
+    Runs a game server until it is interrupted
+    """
+    with ProcessPoolExecutor(workers) as executor:
+        game_server = GameServer(executor, engine, time_limit)
+        server = await asyncio.start_server(game_server.handle, host, port)
+        print(f"Serving on {host}:{port} with {workers} bot workers",
+              flush=True)
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == "__main__":
+    host = "127.0.0.1"
+    port = 7878
+    workers = os.cpu_count() or 1
+    time_limit = 0.1
+    engine = Reversi
+
+    for i, item in enumerate(sys.argv):
+        if item == "-H":
+            host = sys.argv[i + 1]
+        if item == "-p":
+            port = int(sys.argv[i + 1])
+        if item == "-w":
+            workers = int(sys.argv[i + 1])
+        if item == "-t":
+            time_limit = float(sys.argv[i + 1])
+        if item == "-e" and sys.argv[i + 1] == "bitboard":
+            engine = BitboardReversi
+
+    try:
+        asyncio.run(serve(host, port, workers, engine, time_limit))
+    except KeyboardInterrupt:
+        pass
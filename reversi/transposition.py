@@ -0,0 +1,160 @@
+"""
+Transposition table for Reversi searches.
+
+Entries are keyed by a 64-bit position hash (ReversiBase.position_hash
+in the searches, ReversiBase.canonical_key for values that do not
+change when the board is rotated or mirrored) and stored in flat
+arrays (one per field) rather than in a dictionary, so the memory
+used is fixed when the table is created. Each bucket has two slots:
+a depth-preferred slot, which keeps the deepest result seen for the
+bucket, and an always-replace slot, which keeps the most recent one.
+"""
+from array import array
+from typing import Optional, Tuple
+
+
+EXACT = 0
+"""
+Bound type of a score that is the exact value of the position.
+"""
+
+LOWER = 1
+"""
+Bound type of a score that is a lower bound (the search failed high).
+"""
+
+UPPER = 2
+"""
+Bound type of a score that is an upper bound (the search failed low).
+"""
+
+ENTRY_BYTES = 16
+"""
+Size of an entry: 8 bytes of key, 4 of score, 2 of move, and 1 each
+of depth and bound type.
+"""
+
+EntryType = Tuple[int, int, int, Optional[Tuple[int, int]]]
+"""
+Type for an entry returned by a probe: depth, bound type, score and
+best move (or None if there is no best move).
+"""
+
+
+class TranspositionTable:
+    """
+    Class to represent a fixed-size table of search results.
+
+    Attributes:
+        hits (int): number of probes that found their position
+        misses (int): number of probes that did not
+        collisions (int): number of misses where the bucket held
+            other positions
+    """
+    hits: int
+    misses: int
+    collisions: int
+
+    def __init__(self, megabytes: float = 16):
+        """
+        Constructor
+
+        Args:
+            megabytes: Memory to use for the entries
+
+        Raises:
+            ValueError: If megabytes is not positive
+        """
+        if megabytes <= 0:
+            raise ValueError("The table size must be positive")
+        self._buckets = max(1, int(megabytes * 2**20) // (2 * ENTRY_BYTES))
+        slots = 2 * self._buckets
+        self._keys = array("Q", [0]) * slots
+        self._scores = array("i", [0]) * slots
+        self._moves = array("h", [-1]) * slots
+        self._depths = array("b", [-1]) * slots
+        self._flags = array("b", [0]) * slots
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+
+    def __len__(self) -> int:
+        """
+        Returns the number of slots in the table
+        """
+        return len(self._keys)
+
+    def clear(self) -> None:
+        """
+        Removes every entry and resets the counters
+        """
+        self._depths = array("b", [-1]) * len(self._keys)
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+
+    def probe(self, key: int) -> Optional[EntryType]:
+        """
+        Looks up a position.
+
+        Args:
+            key: Hash of the position
+
+        Returns: The (depth, bound type, score, best move) stored for
+        the position, or None if it is not in the table.
+        """
+        slot = (key % self._buckets) * 2
+        occupied = False
+        for i in (slot, slot + 1):
+            if self._depths[i] >= 0:
+                if self._keys[i] == key:
+                    self.hits += 1
+                    move = self._moves[i]
+                    return (self._depths[i], self._flags[i], self._scores[i],
+                            None if move < 0 else (move >> 8, move & 0xFF))
+                occupied = True
+        self.misses += 1
+        if occupied:
+            self.collisions += 1
+        return None
+
+    def store(self, key: int, depth: int, flag: int, score: int,
+              move: Optional[Tuple[int, int]] = None) -> None:
+        """
+        Stores a search result. The result goes in the depth-preferred
+        slot if that slot holds the same position or a result searched
+        no deeper (moving the result it replaces to the always-replace
+        slot); otherwise it goes in the always-replace slot.
+
+        Args:
+            key: Hash of the position
+            depth: Depth the position was searched to
+            flag: Bound type of the score (EXACT, LOWER or UPPER)
+            score: Score of the position
+            move: Best move found, if any
+
+        Returns: None
+        """
+        slot = (key % self._buckets) * 2
+        if self._keys[slot] == key or depth >= self._depths[slot]:
+            if self._depths[slot] >= 0 and self._keys[slot] != key:
+                # the replaced entry is still the most recent one
+                # for its position
+                self._copy_slot(slot, slot + 1)
+        else:
+            slot += 1
+        self._keys[slot] = key
+        self._depths[slot] = min(depth, 127)
+        self._flags[slot] = flag
+        self._scores[slot] = score
+        self._moves[slot] = -1 if move is None else move[0] << 8 | move[1]
+
+    def _copy_slot(self, source: int, target: int) -> None:
+        """
+        Copies the entry in one slot to another
+        """
+        self._keys[target] = self._keys[source]
+        self._depths[target] = self._depths[source]
+        self._flags[target] = self._flags[source]
+        self._scores[target] = self._scores[source]
+        self._moves[target] = self._moves[source]